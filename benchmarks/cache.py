@@ -0,0 +1,52 @@
+"""
+Cache backend simulating the latency of a cache server. Kept apart from the
+fake storages since it's loaded while Collectfast's strategies are imported.
+"""
+
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+from django.core.cache.backends.locmem import LocMemCache
+
+from .latency import cache_latency
+
+
+class FakeCache(LocMemCache):
+    """Local memory cache simulating the latency of a cache server."""
+
+    _missing_key = object()
+
+    def get(self, *args: Any, **kwargs: Any) -> Any:
+        cache_latency.request()
+        return super().get(*args, **kwargs)
+
+    def set(self, *args: Any, **kwargs: Any) -> None:
+        cache_latency.request()
+        super().set(*args, **kwargs)
+
+    def delete(self, *args: Any, **kwargs: Any) -> bool:
+        cache_latency.request()
+        return super().delete(*args, **kwargs)
+
+    def get_many(self, keys: Iterable[Any], version: Optional[int] = None) -> Any:
+        cache_latency.request()
+        values = {}
+        for key in keys:
+            value = LocMemCache.get(self, key, self._missing_key, version=version)
+            if value is not self._missing_key:
+                values[key] = value
+        return values
+
+    def set_many(self, data: Dict[Any, Any], *args: Any, **kwargs: Any) -> List[Any]:
+        cache_latency.request()
+        for key, value in data.items():
+            LocMemCache.set(self, key, value, *args, **kwargs)
+        return []
+
+    def delete_many(self, keys: Iterable[Any], version: Optional[int] = None) -> None:
+        cache_latency.request()
+        for key in keys:
+            LocMemCache.delete(self, key, version=version)
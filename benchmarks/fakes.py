@@ -0,0 +1,263 @@
+"""
+In-process stand-ins for remote storages that simulate request latency and
+bandwidth.
+"""
+
+import base64
+import hashlib
+import mimetypes
+import threading
+from contextlib import contextmanager
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import botocore.exceptions
+from django.core.files.base import ContentFile
+from django.core.files.base import File
+from django.core.files.storage import Storage
+from google.api_core.exceptions import NotFound
+from storages.backends.gcloud import GoogleCloudStorage
+from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
+
+from collectfast.strategies.boto3 import MultipartETag
+
+from .latency import remote_latency
+
+# Number of objects returned per page by listing requests.
+PAGE_SIZE = 1000
+
+
+class ObjectStore:
+    """Thread safe in-memory mapping of object names to contents."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.objects: Dict[str, bytes] = {}
+
+    def get(self, name: str) -> Optional[bytes]:
+        remote_latency.request()
+        with self.lock:
+            return self.objects.get(name)
+
+    def put(self, name: str, data: bytes) -> None:
+        remote_latency.request(len(data))
+        with self.lock:
+            self.objects[name] = data
+
+    def delete(self, name: str) -> bool:
+        remote_latency.request()
+        with self.lock:
+            return self.objects.pop(name, None) is not None
+
+    def list(self, prefix: str) -> Iterator[Tuple[str, bytes]]:
+        with self.lock:
+            items = sorted(
+                (name, data)
+                for name, data in self.objects.items()
+                if name.startswith(prefix)
+            )
+        for i, item in enumerate(items):
+            if i % PAGE_SIZE == 0:
+                remote_latency.request()
+            yield item
+
+
+def read_content(content: File) -> bytes:
+    content.seek(0)
+    data = content.read()
+    return data.encode() if isinstance(data, str) else data
+
+
+class FakeStorage(Storage):
+    """Storage keeping files in memory, for the filesystem strategies."""
+
+    file_overwrite = True
+    store = ObjectStore()
+
+    def _open(self, name: str, mode: str = "rb") -> File:
+        data = self.store.get(name)
+        if data is None:
+            raise FileNotFoundError(name)
+        remote_latency.request(len(data))
+        return ContentFile(data, name=name)
+
+    def _save(self, name: str, content: File) -> str:
+        self.store.put(name, read_content(content))
+        return name
+
+    def get_available_name(self, name: str, max_length: Optional[int] = None) -> str:
+        return name
+
+    def exists(self, name: str) -> bool:
+        return self.store.get(name) is not None
+
+    def size(self, name: str) -> int:
+        data = self.store.get(name)
+        if data is None:
+            raise FileNotFoundError(name)
+        return len(data)
+
+    def delete(self, name: str) -> None:
+        self.store.delete(name)
+
+    def listdir(self, path: str) -> Tuple[List[str], List[str]]:
+        prefix = path.rstrip("/") + "/" if path else ""
+        start = len(prefix)
+        dirs, files = set(), []
+        for name, _ in self.store.list(prefix):
+            head, sep, _tail = name[start:].partition("/")
+            if sep:
+                dirs.add(head)
+            else:
+                files.append(head)
+        return sorted(dirs), files
+
+
+def not_found_error(operation: str) -> botocore.exceptions.ClientError:
+    return botocore.exceptions.ClientError(
+        {
+            "Error": {"Code": "404", "Message": "Not Found"},
+            "ResponseMetadata": {"HTTPStatusCode": 404},
+        },
+        operation,
+    )
+
+
+class FakeS3Object:
+    def __init__(self, bucket: "FakeS3Bucket", key: str) -> None:
+        self.bucket = bucket
+        self.key = key
+        self._data: Optional[bytes] = None
+
+    def load(self) -> bytes:
+        if self._data is None:
+            self._data = self.bucket.store.get(self.key)
+        if self._data is None:
+            raise not_found_error("HeadObject")
+        return self._data
+
+    @property
+    def e_tag(self) -> str:
+        self.load()
+        return f'"{self.bucket.etags[self.key]}"'
+
+    @property
+    def content_length(self) -> int:
+        return len(self.load())
+
+    def upload_fileobj(self, fileobj: Any, ExtraArgs: Any, Config: Any) -> None:
+        data = fileobj.read()
+        # Compute the ETag S3 assigns, which differs from the md5 hash of the
+        # contents for multipart uploads.
+        etag = MultipartETag(Config.multipart_threshold, Config.multipart_chunksize)
+        etag.update(data)
+        self.bucket.etags[self.key] = etag.hexdigest()
+        self.bucket.store.put(self.key, data)
+
+    def delete(self) -> None:
+        self.bucket.store.delete(self.key)
+
+
+class FakeS3Summary:
+    def __init__(self, key: str, e_tag: str, size: int) -> None:
+        self.key = key
+        self.e_tag = e_tag
+        self.size = size
+
+
+class FakeS3Objects:
+    def __init__(self, bucket: "FakeS3Bucket") -> None:
+        self.bucket = bucket
+
+    def filter(self, Prefix: str) -> Iterable[FakeS3Summary]:
+        for key, data in self.bucket.store.list(Prefix):
+            yield FakeS3Summary(key, f'"{self.bucket.etags[key]}"', len(data))
+
+
+class FakeS3Bucket:
+    def __init__(self) -> None:
+        self.store = ObjectStore()
+        self.etags: Dict[str, str] = {}
+        self.objects = FakeS3Objects(self)
+
+    def Object(self, key: str) -> FakeS3Object:
+        return FakeS3Object(self, key)
+
+    def delete_objects(self, Delete: Dict[str, Any]) -> Dict[str, Any]:
+        remote_latency.request()
+        with self.store.lock:
+            for item in Delete["Objects"]:
+                self.store.objects.pop(item["Key"], None)
+        return {}
+
+
+class FakeS3Resource:
+    bucket = FakeS3Bucket()
+
+    def Bucket(self, name: str) -> FakeS3Bucket:
+        return self.bucket
+
+
+class FakeS3Storage(S3Boto3Storage):
+    """S3Boto3Storage talking to an in-memory bucket."""
+
+    @property
+    def connection(self) -> FakeS3Resource:
+        return FakeS3Resource()
+
+
+class FakeBlob:
+    def __init__(self, name: str, data: bytes) -> None:
+        self.name = name
+        self.size = len(data)
+        md5 = hashlib.md5(data).digest()
+        self._properties = {"md5Hash": base64.b64encode(md5).decode()}
+
+
+class FakeGCSBucket:
+    store = ObjectStore()
+
+    def get_blob(self, name: str, **kwargs: Any) -> Optional[FakeBlob]:
+        data = self.store.get(name)
+        return None if data is None else FakeBlob(name, data)
+
+    def list_blobs(self, prefix: str, fields: str) -> Iterator[FakeBlob]:
+        for name, data in self.store.list(prefix):
+            yield FakeBlob(name, data)
+
+    def delete_blob(self, name: str) -> None:
+        if not self.store.delete(name):
+            raise NotFound(name)
+
+
+class FakeGCSClient:
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        yield
+
+
+class FakeGCSStorage(GoogleCloudStorage):
+    """GoogleCloudStorage talking to an in-memory bucket."""
+
+    @property
+    def client(self) -> FakeGCSClient:
+        return FakeGCSClient()
+
+    @property
+    def bucket(self) -> FakeGCSBucket:
+        return FakeGCSBucket()
+
+    def _save(self, name: str, content: File) -> str:
+        cleaned_name = clean_name(name)
+        name = self._normalize_name(cleaned_name)
+        content_type = mimetypes.guess_type(name)[0]
+        if self.gzip and content_type in self.gzip_content_types:
+            content = self._compress_content(content)
+        self.bucket.store.put(name, read_content(content))
+        return cleaned_name
@@ -0,0 +1,33 @@
+"""
+Simulated request latency, configured by the runner through environment
+variables.
+"""
+
+import os
+import time
+
+
+class Latency:
+    """Simulated cost of a request: a fixed delay plus transfer time."""
+
+    def __init__(self, latency: float, bandwidth: float) -> None:
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    @classmethod
+    def from_environ(cls, prefix: str) -> "Latency":
+        return cls(
+            float(os.environ.get(f"{prefix}_LATENCY", "0")),
+            float(os.environ.get(f"{prefix}_BANDWIDTH", "0")),
+        )
+
+    def request(self, size: int = 0) -> None:
+        delay = self.latency
+        if self.bandwidth:
+            delay += size / self.bandwidth
+        if delay:
+            time.sleep(delay)
+
+
+remote_latency = Latency.from_environ("BENCHMARK_REMOTE")
+cache_latency = Latency.from_environ("BENCHMARK_CACHE")
@@ -0,0 +1,160 @@
+"""
+Benchmark collectstatic against in-process fake remote storages.
+
+Generates a synthetic static tree and runs each strategy for each thread count
+in a separate process, printing a table of wall times. Run from the repository
+root:
+
+    python -m benchmarks.run --files 2000 --threads 0,10,50 --latency 0.02
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from typing import Any
+from typing import Dict
+from typing import List
+
+from typing_extensions import Final
+
+STRATEGIES: Final = {
+    "filesystem": (
+        "benchmarks.fakes.FakeStorage",
+        "collectfast.strategies.filesystem.FileSystemStrategy",
+    ),
+    "cachingfilesystem": (
+        "benchmarks.fakes.FakeStorage",
+        "collectfast.strategies.filesystem.CachingFileSystemStrategy",
+    ),
+    "boto3": (
+        "benchmarks.fakes.FakeS3Storage",
+        "collectfast.strategies.boto3.Boto3Strategy",
+    ),
+    "gcloud": (
+        "benchmarks.fakes.FakeGCSStorage",
+        "collectfast.strategies.gcloud.GoogleCloudStrategy",
+    ),
+}
+EXTENSIONS: Final = (".css", ".js", ".svg", ".png", ".woff2", ".txt")
+# Number of files per generated directory.
+DIRECTORY_SIZE: Final = 100
+
+
+def generate_tree(
+    root: str, files: int, min_size: int, max_size: int, seed: int
+) -> int:
+    """
+    Write files with log-uniformly distributed sizes to root. Returns the total
+    size of the written files.
+    """
+    rng = random.Random(seed)
+    total = 0
+    for i in range(files):
+        directory = os.path.join(root, f"dir{i // DIRECTORY_SIZE}")
+        os.makedirs(directory, exist_ok=True)
+        size = int(math.exp(rng.uniform(math.log(min_size), math.log(max_size))))
+        extension = EXTENSIONS[i % len(EXTENSIONS)]
+        with open(os.path.join(directory, f"file{i}{extension}"), "wb") as f:
+            f.write(rng.getrandbits(8 * size).to_bytes(size, "little"))
+        total += size
+    return total
+
+
+def run_scenario(
+    strategy: str, threads: int, args: argparse.Namespace, static_dir: str
+) -> List[Dict[str, Any]]:
+    storage, strategy_path = STRATEGIES[strategy]
+    with tempfile.TemporaryDirectory() as static_root:
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "benchmarks.settings",
+            "BENCHMARK_STATIC_DIR": static_dir,
+            "BENCHMARK_STATIC_ROOT": static_root,
+            "BENCHMARK_STORAGE": storage,
+            "BENCHMARK_STRATEGY": strategy_path,
+            "BENCHMARK_THREADS": str(threads),
+            "BENCHMARK_REMOTE_LATENCY": str(args.latency),
+            "BENCHMARK_REMOTE_BANDWIDTH": str(args.bandwidth),
+            "BENCHMARK_CACHE_LATENCY": str(args.cache_latency),
+            "BENCHMARK_SETTINGS": json.dumps(dict(args.setting)),
+        }
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.scenario"],
+            env=env,
+            check=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+    results: List[Dict[str, Any]] = json.loads(output)
+    for result in results:
+        result.update(strategy=strategy, threads=threads)
+    return results
+
+
+def parse_setting(value: str) -> Any:
+    name, _, raw_value = value.partition("=")
+    return name, json.loads(raw_value)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--min-size", type=int, default=100)
+    parser.add_argument("--max-size", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--strategies", default=",".join(STRATEGIES), help="Comma separated list."
+    )
+    parser.add_argument("--threads", default="0,10", help="Comma separated list.")
+    parser.add_argument(
+        "--latency", type=float, default=0.01, help="Seconds per remote request."
+    )
+    parser.add_argument(
+        "--bandwidth",
+        type=float,
+        default=50_000_000,
+        help="Bytes per second of remote transfers, 0 for unlimited.",
+    )
+    parser.add_argument(
+        "--cache-latency", type=float, default=0.001, help="Seconds per cache request."
+    )
+    parser.add_argument(
+        "--setting",
+        action="append",
+        type=parse_setting,
+        default=[],
+        metavar="NAME=JSON",
+        help="Additional Django setting, e.g. COLLECTFAST_PIPELINE=true.",
+    )
+    parser.add_argument("--output", help="Write all results as JSON to this path.")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    results = []
+    with tempfile.TemporaryDirectory() as static_dir:
+        total = generate_tree(
+            static_dir, args.files, args.min_size, args.max_size, args.seed
+        )
+        print(f"Generated {args.files} files, {total} bytes in total.")
+        print(f"{'strategy':<18} {'threads':>7} {'run':<8} {'copied':>7} {'time':>8}")
+        for strategy in args.strategies.split(","):
+            for threads in map(int, args.threads.split(",")):
+                for result in run_scenario(strategy, threads, args, static_dir):
+                    print(
+                        f"{strategy:<18} {threads:>7} {result['run']:<8} "
+                        f"{result['copied']:>7} {result['wall_time']:>7.2f}s"
+                    )
+                    results.append(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
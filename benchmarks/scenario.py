@@ -0,0 +1,53 @@
+"""
+Run collectstatic three times against a fake remote storage: an initial upload
+to an empty remote, a run with a cold cache and a run with a warm cache. Prints
+the results as JSON. Started by the benchmark runner in a separate process for
+each strategy and thread count, since Collectfast reads its settings on import.
+"""
+
+import json
+import os
+import tempfile
+import time
+from io import StringIO
+from typing import Any
+from typing import Dict
+
+import django
+from django.core.cache import caches
+from django.core.management import call_command
+
+
+def run_collectstatic(name: str) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        report_path = os.path.join(directory, "report.json")
+        started = time.perf_counter()
+        output = call_command(
+            "collectstatic",
+            interactive=False,
+            verbosity=0,
+            stdout=StringIO(),
+            timing_report=report_path,
+        )
+        wall_time = time.perf_counter() - started
+        with open(report_path) as f:
+            report = json.load(f)
+    return {
+        "run": name,
+        "wall_time": wall_time,
+        "copied": int(output.split()[0]),
+        "report": report,
+    }
+
+
+def main() -> None:
+    django.setup()
+    results = [run_collectstatic("initial")]
+    caches["default"].clear()
+    results.append(run_collectstatic("cold"))
+    results.append(run_collectstatic("warm"))
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
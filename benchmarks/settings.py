@@ -0,0 +1,31 @@
+"""
+Django settings for benchmark scenarios, configured by the runner through
+environment variables.
+"""
+
+import json
+import os
+
+SECRET_KEY = "benchmarks"
+USE_TZ = True
+INSTALLED_APPS = ("collectfast", "django.contrib.staticfiles")
+STATIC_URL = "/static/"
+STATIC_ROOT = os.environ["BENCHMARK_STATIC_ROOT"]
+STATICFILES_DIRS = [os.environ["BENCHMARK_STATIC_DIR"]]
+STATICFILES_STORAGE = os.environ["BENCHMARK_STORAGE"]
+COLLECTFAST_STRATEGY = os.environ["BENCHMARK_STRATEGY"]
+COLLECTFAST_THREADS = int(os.environ.get("BENCHMARK_THREADS", "0"))
+CACHES = {
+    "default": {
+        "BACKEND": "benchmarks.cache.FakeCache",
+        "LOCATION": "benchmarks",
+        "OPTIONS": {"MAX_ENTRIES": 10**7},
+    }
+}
+
+AWS_STORAGE_BUCKET_NAME = "benchmarks"
+AWS_DEFAULT_ACL = None
+GS_BUCKET_NAME = "benchmarks"
+
+# Additional settings, e.g. {"COLLECTFAST_PRELOAD_REMOTE_HASHES": true}.
+globals().update(json.loads(os.environ.get("BENCHMARK_SETTINGS", "{}")))
@@ -0,0 +1,94 @@
+"""
+Search for the number of concurrent remote requests giving the highest
+throughput, used when COLLECTFAST_THREADS is "auto".
+"""
+
+import logging
+import threading
+import time
+from typing import Optional
+
+from django.core.cache import caches
+from django.core.files.storage import Storage
+
+from collectfast import settings
+from collectfast.throttling import AdaptiveLimiter
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_key(storage: Storage) -> str:
+    # Storages are often lazy objects, which proxy __class__ but not type().
+    storage_class = storage.__class__
+    return (
+        f"{settings.cache_key_prefix}threads:"
+        f"{storage_class.__module__}.{storage_class.__qualname__}"
+    )
+
+
+def get_remembered_threads(storage: Storage) -> Optional[int]:
+    value = caches[settings.cache].get(get_cache_key(storage))
+    return value if isinstance(value, int) else None
+
+
+def remember_threads(storage: Storage, threads: int) -> None:
+    caches[settings.cache].set(get_cache_key(storage), threads, None)
+
+
+class ThreadTuner:
+    """
+    Hill climbing on the maximum of the request limiter. The maximum doubles
+    after each window of completed files as long as files/s or bytes/s improve
+    by at least min_gain over the best window so far. Once neither does, the
+    maximum settles at the best value seen.
+    """
+
+    min_gain = 0.1
+    # Minimum number of files per measured window, windows also span at least
+    # two files per allowed request.
+    window_files = 20
+
+    def __init__(self, limiter: AdaptiveLimiter, maximum: int, initial: int) -> None:
+        self.limiter = limiter
+        self.maximum = maximum
+        self.value = min(initial, maximum)
+        self.best = self.value
+        self.best_rates = (0.0, 0.0)
+        self.settled = False
+        self._lock = threading.Lock()
+        self._files = 0
+        self._bytes = 0
+        self._started = time.perf_counter()
+        limiter.set_maximum(self.value)
+
+    def task_done(self, size: int) -> None:
+        """Account a completed file of size bytes, and adjust at window ends."""
+        with self._lock:
+            if self.settled:
+                return
+            self._files += 1
+            self._bytes += size
+            if self._files >= max(self.window_files, 2 * self.value):
+                self._end_window()
+
+    def _end_window(self) -> None:
+        elapsed = max(time.perf_counter() - self._started, 1e-9)
+        rates = (self._files / elapsed, self._bytes / elapsed)
+        logger.debug(
+            "Measured throughput",
+            extra={"threads": self.value, "files/s": rates[0], "bytes/s": rates[1]},
+        )
+        improved = any(
+            rate > best * (1 + self.min_gain)
+            for rate, best in zip(rates, self.best_rates)
+        )
+        if improved:
+            self.best, self.best_rates = self.value, rates
+        if not improved or self.value >= self.maximum:
+            self.settled = True
+            self.value = self.best
+        else:
+            self.value = min(self.value * 2, self.maximum)
+        self.limiter.set_maximum(self.value)
+        self._files = self._bytes = 0
+        self._started = time.perf_counter()
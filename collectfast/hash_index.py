@@ -0,0 +1,100 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Dict
+
+from django.conf import settings as django_settings
+from django.core.exceptions import ImproperlyConfigured
+
+from collectfast import settings
+from collectfast.hashing import Entry
+from collectfast.hashing import get_stat_key
+
+logger = logging.getLogger(__name__)
+
+
+def get_index_path() -> str:
+    if settings.local_hash_index_path:
+        return settings.local_hash_index_path
+    static_root = getattr(django_settings, "STATIC_ROOT", None)
+    if not static_root:
+        raise ImproperlyConfigured(
+            "COLLECTFAST_LOCAL_HASH_INDEX requires either "
+            "COLLECTFAST_LOCAL_HASH_INDEX_PATH or STATIC_ROOT to be set."
+        )
+    parent = os.path.dirname(os.path.abspath(static_root))
+    return os.path.join(parent, ".collectfast-hashes.json")
+
+
+class LocalHashIndex:
+    """
+    Persistent mapping from local file paths to their hashes, keyed by size,
+    mtime and inode, so that files that haven't changed since the last run
+    don't need to be hashed again. hash_identity identifies how the hashes are
+    computed, entries computed differently are discarded.
+    """
+
+    version = 1
+
+    def __init__(self, path: str, hash_identity: str = "") -> None:
+        self.path = path
+        self.hash_identity = hash_identity
+        self._lock = threading.Lock()
+        self._seen: Dict[str, Entry] = {}
+        self._written_ns = 0
+        self._entries = self._load()
+
+    def _load(self) -> Dict[str, Entry]:
+        try:
+            with open(self.path) as file:
+                self._written_ns = os.fstat(file.fileno()).st_mtime_ns
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning("Ignoring corrupt local hash index %s", self.path)
+            return {}
+        if data.get("version") != self.version:
+            return {}
+        if data.get("hash_identity", "") != self.hash_identity:
+            logger.debug("Discarding local hash index computed with other hashes")
+            return {}
+        entries: Dict[str, Entry] = data["entries"]
+        return entries
+
+    def get(self, filesystem_path: str) -> Entry:
+        """
+        Return the stored hashes of a file, or an empty entry if it has
+        changed. Hashes added to the returned entry are saved with the index.
+        """
+        key = get_stat_key(os.stat(filesystem_path))
+        with self._lock:
+            entry = self._entries.get(filesystem_path)
+            # A file modified in the same instant the index was written could
+            # have changed without its stat data changing, so it isn't trusted.
+            if entry is None or entry["stat"] != key or key[1] >= self._written_ns:
+                entry = {"stat": key}
+            self._seen[filesystem_path] = entry
+        return entry
+
+    def save(self) -> None:
+        """
+        Atomically replace the index file with the entries of all files that
+        were looked up during this run.
+        """
+        with self._lock:
+            if not self._seen:
+                return
+            data = {
+                "version": self.version,
+                "hash_identity": self.hash_identity,
+                "entries": self._seen,
+            }
+            directory = os.path.dirname(os.path.abspath(self.path))
+            with tempfile.NamedTemporaryFile(
+                "w", dir=directory, prefix=".collectfast-", delete=False
+            ) as file:
+                json.dump(data, file, separators=(",", ":"))
+            os.replace(file.name, self.path)
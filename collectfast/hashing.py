@@ -0,0 +1,110 @@
+"""
+Hashing helpers that don't depend on Django, so that they can be used in worker
+processes.
+"""
+
+import gzip
+import os
+from typing import IO
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+from typing import cast
+
+from typing_extensions import Protocol
+
+Entry = Dict[str, Any]
+
+
+class Hash(Protocol):
+    def update(self, data: bytes) -> None:
+        ...
+
+    def hexdigest(self) -> str:
+        ...
+
+
+HashFactory = Callable[[], Hash]
+
+
+class HashWriter:
+    """
+    Write-only file-like object that feeds all written data to a hash, and
+    optionally copies it to another file.
+    """
+
+    def __init__(self, hash_: Hash, copy_to: Optional[IO[bytes]] = None) -> None:
+        self.hash = hash_
+        self.copy_to = copy_to
+
+    def write(self, data: bytes) -> int:
+        self.hash.update(data)
+        if self.copy_to is not None:
+            self.copy_to.write(data)
+        return len(data)
+
+
+def open_gzip_writer(hash_: Hash, copy_to: Optional[IO[bytes]] = None) -> gzip.GzipFile:
+    """
+    Return a gzip file that feeds its compressed output to hash_, and copies it
+    to copy_to if given. The output is identical to what storages produce when
+    compressing uploads.
+    """
+    fileobj = cast(IO[bytes], HashWriter(hash_, copy_to))
+    return gzip.GzipFile(mode="wb", fileobj=fileobj, mtime=0.0)
+
+
+def read_chunks(file: IO[bytes], chunk_size: int) -> Iterator[memoryview]:
+    """
+    Read a file into a single reused buffer, yielding views of the bytes read.
+    Each view is only valid until the next one is yielded. Hashing a view
+    releases the GIL and doesn't copy it.
+    """
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        count = file.readinto(buffer)  # type: ignore
+        if not count:
+            return
+        yield view[:count]
+
+
+def get_stat_key(stat: os.stat_result) -> List[int]:
+    return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+
+def hash_file(
+    filesystem_path: str, hash_factory: HashFactory, chunk_size: int, gzipped: bool
+) -> Entry:
+    """
+    Hash the contents of a file and, if gzipped is true, its gzipped contents in
+    a single pass. The stat data of the file is included in the returned entry.
+    """
+    stat = os.stat(filesystem_path)
+    hash_ = hash_factory()
+    gzip_hash = hash_factory()
+    gzip_file = open_gzip_writer(gzip_hash) if gzipped else None
+    with open(filesystem_path, "rb", buffering=0) as file:
+        for chunk in read_chunks(file, chunk_size):
+            hash_.update(chunk)
+            if gzip_file is not None:
+                gzip_file.write(chunk)
+    entry = {"stat": get_stat_key(stat), "md5": hash_.hexdigest()}
+    if gzip_file is not None:
+        gzip_file.close()
+        entry["gzip"] = gzip_hash.hexdigest()
+    return entry
+
+
+def hash_files(
+    jobs: Sequence[Tuple[str, bool]], hash_factory: HashFactory, chunk_size: int
+) -> List[Entry]:
+    """Hash a batch of (filesystem_path, gzipped) jobs in a worker process."""
+    return [
+        hash_file(path, hash_factory, chunk_size, gzipped) for path, gzipped in jobs
+    ]
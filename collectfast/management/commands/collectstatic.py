@@ -1,34 +1,119 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
 from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from typing import Dict
+from typing import Iterable
+from typing import Iterator
 from typing import List
 from typing import Optional
+from typing import Set
 from typing import Tuple
 from typing import Type
 
 from django.conf import settings as django_settings
 from django.contrib.staticfiles.management.commands import collectstatic
+from django.contrib.staticfiles.storage import ManifestFilesMixin
 from django.core.exceptions import ImproperlyConfigured
 from django.core.files.storage import Storage
+from django.core.management.base import CommandError
 from django.core.management.base import CommandParser
 
 from collectfast import __version__
 from collectfast import settings
+from collectfast.autotune import ThreadTuner
+from collectfast.autotune import get_remembered_threads
+from collectfast.autotune import remember_threads
+from collectfast.plan import Plan
+from collectfast.post_process import post_process_incrementally
+from collectfast.sharding import load_marker
+from collectfast.sharding import marker_name
+from collectfast.sharding import named_run_key
+from collectfast.sharding import parse_shard
+from collectfast.sharding import run_key
+from collectfast.sharding import save_marker
+from collectfast.sharding import split_tasks
 from collectfast.strategies import DisabledStrategy
 from collectfast.strategies import Strategy
 from collectfast.strategies import load_strategy
+from collectfast.strategies.base import HashStrategy
+from collectfast.throttling import AdaptiveLimiter
+from collectfast.throttling import ThrottledError
 
 Task = Tuple[str, str, Storage]
 
 
+class PathList(List[str]):
+    """
+    List of prefixed paths with constant time membership tests, for the lists
+    of copied and symlinked files that are looked up for every file.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._members: Set[str] = set()
+
+    def append(self, path: str) -> None:
+        super().append(path)
+        self._members.add(path)
+
+    def __contains__(self, path: object) -> bool:
+        return path in self._members
+
+
 class Command(collectstatic.Command):
+    # Number of discovered files submitted to the pool at once in pipelined
+    # mode.
+    pipeline_batch_size = 100
+    # Maximum number of tasks submitted to the pool and not yet finished. The
+    # finders wait for workers to catch up once it's reached.
+    max_queued_tasks = 1000
+    # Number of threads deciding which files to copy when computing a plan with
+    # threads disabled.
+    plan_threads = 20
+    # Number of concurrent requests the search starts with when threads are
+    # tuned automatically.
+    auto_threads_initial = 4
+    # Seconds between checks for the markers of other shards.
+    shard_poll_interval = 5.0
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         super().__init__(*args, **kwargs)
         self.num_copied_files = 0
         self.tasks: List[Task] = []
         self.collectfast_enabled = settings.enabled
         self.strategy: Strategy = DisabledStrategy(Storage())
+        self.copied_files: List[str] = PathList()
+        self.symlinked_files: List[str] = PathList()
         self.found_files: Dict[str, Tuple[Storage, str]] = {}
+        # Found files are only recorded when post-processing or planning needs
+        # them.
+        self.record_found_files = True
+        self.pool: Optional[ThreadPoolExecutor] = None
+        self.queue_slots = threading.BoundedSemaphore(self.max_queued_tasks)
+        # Exceptions raised by tasks run in the pool.
+        self.task_errors: List[BaseException] = []
+        self.timing_report: Optional[str] = None
+        self.threads = settings.threads
+        self.tuner: Optional[ThreadTuner] = None
+        # The plan being computed with --plan, and the plan applied with --apply.
+        self.plan: Optional[Plan] = None
+        self.plan_path: Optional[str] = None
+        self.applied_plan: Optional[Plan] = None
+        self.remote_files: List[str] = []
+        # Index and number of shards, the key identifying the sharded run and
+        # the files of this shard.
+        self.shard: Optional[Tuple[int, int]] = None
+        self.shard_run: Optional[str] = None
+        self.shard_key = ""
+        self.shard_paths: List[str] = []
+        # Files copied by other shards, imported from their markers.
+        self.shard_copied_files: Set[str] = set()
+        # Time spent in copy_file() by the thread running the finders.
+        self.dispatch_time = 0.0
 
     @staticmethod
     def _load_strategy() -> Type[Strategy[Storage]]:
@@ -52,46 +137,335 @@ class Command(collectstatic.Command):
             default=False,
             help="Disable Collectfast.",
         )
+        parser.add_argument(
+            "--timing-report",
+            dest="timing_report",
+            default=None,
+            metavar="PATH",
+            help="Write phase timings, latencies and byte counts as JSON to PATH.",
+        )
+        group = parser.add_mutually_exclusive_group()
+        group.add_argument(
+            "--plan",
+            dest="plan",
+            default=None,
+            metavar="PATH",
+            help=(
+                "Decide which files to upload, skip and delete without changing "
+                "the remote storage, and write the plan as JSON to PATH."
+            ),
+        )
+        group.add_argument(
+            "--apply",
+            dest="apply",
+            default=None,
+            metavar="PLAN",
+            help="Upload and delete only the files listed in PLAN.",
+        )
+        parser.add_argument(
+            "--shard",
+            dest="shard",
+            default=None,
+            metavar="i/N",
+            help=(
+                "Copy only the i-th of N parts of the files, split by size. "
+                "Shard 0 post-processes files once the other shards finish."
+            ),
+        )
+        parser.add_argument(
+            "--shard-run",
+            dest="shard_run",
+            default=None,
+            metavar="ID",
+            help=(
+                "Identify the sharded run by ID, like a build number, rather than "
+                "by the sizes and modification times of the collected files."
+            ),
+        )
 
     def set_options(self, **options: Any) -> None:
         self.collectfast_enabled = self.collectfast_enabled and not options.pop(
             "disable_collectfast"
         )
+        self.timing_report = options.pop("timing_report")
+        self.plan_path = options.pop("plan")
+        apply_path = options.pop("apply")
+        shard = options.pop("shard")
+        self.shard_run = options.pop("shard_run")
         if self.collectfast_enabled:
             self.strategy = self._load_strategy()(self.storage)
         super().set_options(**options)
+        self.set_plan_options(apply_path)
+        if shard is not None:
+            self.set_shard(shard)
+        elif self.shard_run is not None:
+            raise CommandError("--shard-run requires --shard.")
+        # --plan and --shard may change the number of threads.
+        self.strategy.limiter = AdaptiveLimiter(self.threads or 1)
+        if settings.auto_threads and self.collectfast_enabled:
+            self.tuner = self.create_tuner()
+
+    def set_plan_options(self, apply_path: Optional[str]) -> None:
+        if self.plan_path is not None or apply_path is not None:
+            self.check_plan_options()
+        if self.plan_path is not None:
+            self.plan = Plan()
+            self.threads = self.threads or self.plan_threads
+            self.strategy.defer_checks = False
+            # Nothing is written to the remote storage while planning.
+            self.strategy.write_shared_state = False
+            # Nothing is uploaded, so gzipped contents would only pile up.
+            if isinstance(self.strategy, HashStrategy):
+                self.strategy.keep_compressed = False
+        if apply_path is not None:
+            self.applied_plan = Plan.load(apply_path)
+
+    def create_tuner(self) -> ThreadTuner:
+        initial = None
+        if settings.remember_threads:
+            initial = get_remembered_threads(self.storage)
+        return ThreadTuner(
+            self.strategy.limiter, self.threads, initial or self.auto_threads_initial
+        )
+
+    def set_shard(self, value: str) -> None:
+        if not self.collectfast_enabled:
+            raise CommandError("--shard requires Collectfast to be enabled.")
+        if self.dry_run or self.clear or self.plan or self.applied_plan:
+            raise CommandError(
+                "--shard can't be used with --dry-run, --clear, --plan or --apply."
+            )
+        self.shard = parse_shard(value)
+        # Files are split once all of them are found, by a single thread if
+        # threads are disabled.
+        self.threads = self.threads or 1
+        self.strategy.write_shared_state = self.designated_shard
+
+    def check_plan_options(self) -> None:
+        if not self.collectfast_enabled:
+            raise CommandError("--plan and --apply require Collectfast to be enabled.")
+        if self.dry_run:
+            raise CommandError("--plan and --apply can't be used with --dry-run.")
+        if self.clear and self.plan_path is None:
+            raise CommandError(
+                "--apply can't be used with --clear, pass --clear to --plan instead."
+            )
 
     def collect(self) -> Dict[str, List[str]]:
         """
         Override collect to copy files concurrently. The tasks are populated by
         Command.copy_file() which is called by super().collect().
         """
-        if not self.collectfast_enabled or not settings.threads:
+        if not self.collectfast_enabled:
             return super().collect()
 
         # Store original value of post_process in super_post_process and always
         # set the value to False to prevent the default behavior from
-        # interfering when using threads. See maybe_post_process().
+        # interfering, post-processing has to wait until all parallel uploads
+        # finish. See maybe_post_process().
         super_post_process = self.post_process
         self.post_process = False
+        self.record_found_files = self.needs_found_files(super_post_process)
 
-        return_value = super().collect()
+        with self.strategy.stats.phase("collect"):
+            if self.applied_plan is not None:
+                self.delete_planned_files(self.applied_plan)
+            if self.threads:
+                return_value = self.collect_threaded()
+            else:
+                return_value = self.find_files()
+            if self.plan is not None:
+                # Files are only deleted when they wouldn't be uploaded again.
+                self.plan.delete = sorted(
+                    set(self.remote_files) - set(self.found_files)
+                )
+            elif self.designated_shard:
+                self.wait_for_shards()
+                with self.strategy.stats.phase("post_process"):
+                    self.maybe_post_process(super_post_process)
+            return_value["post_processed"] = self.post_processed_files
+            self.strategy.post_collect_hook()
+            if not self.designated_shard:
+                self.mark_shard_done()
+        if self.tuner is not None:
+            self.finish_tuning(self.tuner)
+        return return_value
+
+    def needs_found_files(self, super_post_process: bool) -> bool:
+        if self.plan is not None:
+            return True
+        return (
+            super_post_process
+            and self.designated_shard
+            and hasattr(self.storage, "post_process")
+        )
 
-        with ThreadPoolExecutor(settings.threads) as pool:
-            pool.map(self.maybe_copy_file, self.tasks)
+    def finish_tuning(self, tuner: ThreadTuner) -> None:
+        self.log(f"Best throughput with {tuner.best} concurrent requests", level=1)
+        if settings.remember_threads:
+            remember_threads(self.storage, tuner.best)
 
-        self.maybe_post_process(super_post_process)
-        return_value["post_processed"] = self.post_processed_files
+    @property
+    def designated_shard(self) -> bool:
+        """Whether this run post-processes files and writes shared state."""
+        return self.shard is None or self.shard[0] == 0
 
+    def find_files(self) -> Dict[str, List[str]]:
+        """
+        Run super().collect(), recording the time spent outside of copy_file()
+        as the find phase.
+        """
+        started = time.perf_counter()
+        self.dispatch_time = 0.0
+        return_value = super().collect()
+        find_time = time.perf_counter() - started - self.dispatch_time
+        self.strategy.stats.add_time("find", find_time)
         return return_value
 
+    def collect_threaded(self) -> Dict[str, List[str]]:
+        with ThreadPoolExecutor(self.threads) as pool:
+            # In pipelined mode files are submitted to the pool in small batches
+            # as they're found, otherwise they're queued in self.tasks until
+            # the finders are exhausted.
+            if settings.pipeline and self.shard is None:
+                self.pool = pool
+            try:
+                return_value = self.find_files()
+            finally:
+                self.pool = None
+            self.submit_tasks(pool, self.select_shard(self.tasks))
+        self.raise_task_errors()
+
+        # The returned lists are built by super().collect() before all copies
+        # have finished.
+        return_value["modified"] = self.copied_files + self.symlinked_files
+        return return_value
+
+    def submit_tasks(self, pool: ThreadPoolExecutor, tasks: List[Task]) -> None:
+        """
+        Submit tasks to the pool, waiting whenever max_queued_tasks of them are
+        queued or running, so that pending work items don't pile up in memory.
+        """
+        self.strategy.on_discover_hook(tasks)
+        for args in tasks:
+            self.queue_slots.acquire()
+            future = pool.submit(self.run_task, args)
+            future.add_done_callback(self.release_queue_slot)
+
+    def release_queue_slot(self, future: "Future[None]") -> None:
+        """Release the slot of a finished task and keep its exception, if any."""
+        error = future.exception()
+        if error is not None:
+            self.task_errors.append(error)
+        self.queue_slots.release()
+
+    def raise_task_errors(self) -> None:
+        """Raise the first exception of a task once the pool has drained."""
+        if not self.task_errors:
+            return
+        if len(self.task_errors) > 1:
+            self.stderr.write(f"Copying {len(self.task_errors)} files failed.")
+        raise self.task_errors[0]
+
+    def run_task(self, args: Task) -> None:
+        self.maybe_copy_file(args)
+        if self.tuner is not None:
+            path, _prefixed_path, source_storage = args
+            self.tuner.task_done(source_storage.size(path))
+
+    def select_shard(self, tasks: List[Task]) -> List[Task]:
+        """
+        Return the tasks of this shard. All files are still recorded as found,
+        for the designated shard to post-process them.
+        """
+        if self.shard is None:
+            return tasks
+        index, count = self.shard
+        self.record_found(tasks)
+        self.shard_key = self.get_shard_key(tasks, count)
+        if not self.designated_shard:
+            self.remove_stale_marker()
+        shard = split_tasks(tasks, count)[index]
+        self.shard_paths = [prefixed_path for _, prefixed_path, _ in shard]
+        self.log(f"Copying {len(shard)} of {len(tasks)} files as shard {index}/{count}")
+        return shard
+
+    def record_found(self, tasks: Iterable[Task]) -> None:
+        if self.record_found_files:
+            for path, prefixed_path, source_storage in tasks:
+                self.found_files[prefixed_path] = (source_storage, path)
+
+    def get_shard_key(self, tasks: List[Task], count: int) -> str:
+        if self.shard_run is not None:
+            return named_run_key(self.shard_run, count)
+        return run_key(tasks, count)
+
+    def remove_stale_marker(self) -> None:
+        """
+        Remove the marker a previous run of this shard left, which would let the
+        designated shard go ahead before this run finishes.
+        """
+        assert self.shard is not None
+        name = marker_name(self.shard_key, self.shard[0])
+        if self.storage.exists(name):
+            self.storage.delete(name)
+
+    def wait_for_shards(self) -> None:
+        """
+        Wait until all other shards left their marker in the remote storage,
+        then import the remote hashes they recorded and remove the markers.
+        """
+        if self.shard is None:
+            return
+        index, count = self.shard
+        names = [marker_name(self.shard_key, i) for i in range(count) if i != index]
+        with self.strategy.stats.phase("wait_for_shards"):
+            self.wait_for_markers(names)
+        for name in names:
+            state = load_marker(self.storage, name)
+            self.strategy.import_remote_hashes(state["hashes"])
+            self.shard_copied_files.update(state["copied"])
+            self.storage.delete(name)
+
+    def wait_for_markers(self, names: List[str]) -> None:
+        deadline = time.monotonic() + settings.shard_timeout
+        pending = names
+        while True:
+            pending = [name for name in pending if not self.storage.exists(name)]
+            if not pending:
+                return
+            if time.monotonic() > deadline:
+                raise CommandError(
+                    f"Timed out waiting for {len(pending)} other shard(s) to finish."
+                )
+            self.log(f"Waiting for {len(pending)} other shard(s) to finish", level=1)
+            time.sleep(self.shard_poll_interval)
+
+    def mark_shard_done(self) -> None:
+        assert self.shard is not None
+        name = marker_name(self.shard_key, self.shard[0])
+        hashes = self.strategy.export_remote_hashes(self.shard_paths)
+        save_marker(self.storage, name, {"hashes": hashes, "copied": self.copied_files})
+
     def handle(self, *args: Any, **options: Any) -> Optional[str]:
         """Override handle to suppress summary output."""
         ret = super().handle(**options)
         if not self.collectfast_enabled:
             return ret
+        if self.timing_report:
+            with open(self.timing_report, "w") as f:
+                json.dump(self.strategy.stats.as_dict(), f, indent=2)
+        if self.plan is not None and self.plan_path is not None:
+            self.plan.save(self.plan_path)
+            return (
+                f"Plan written to {self.plan_path}: {self.plan.summary()}. "
+                f"{self.strategy.stats.summary()}"
+            )
         plural = "" if self.num_copied_files == 1 else "s"
-        return f"{self.num_copied_files} static file{plural} copied."
+        return (
+            f"{self.num_copied_files} static file{plural} copied. "
+            f"{self.strategy.stats.summary()}"
+        )
 
     def maybe_copy_file(self, args: Task) -> None:
         """Determine if file should be copied or not and handle exceptions."""
@@ -100,37 +474,125 @@ class Command(collectstatic.Command):
         # Build up found_files to look identical to how it's created in the
         # builtin command's collect() method so that we can run post_process
         # after all parallel uploads finish.
-        self.found_files[prefixed_path] = (source_storage, path)
+        if self.record_found_files:
+            self.found_files[prefixed_path] = (source_storage, path)
 
         if self.collectfast_enabled and not self.dry_run:
-            self.strategy.pre_should_copy_hook()
-
-            if not self.strategy.should_copy_file(path, prefixed_path, source_storage):
+            should_copy = self.should_copy_file(path, prefixed_path, source_storage)
+            if self.plan is not None:
+                return self.add_to_plan(
+                    self.plan, path, prefixed_path, source_storage, should_copy
+                )
+            if not should_copy:
                 self.log(f"Skipping '{path}'")
-                self.strategy.on_skip_hook(path, prefixed_path, source_storage)
+                # Files skipped by an applied plan weren't checked by this run,
+                # so the strategy isn't told about them.
+                if self.applied_plan is None:
+                    self.strategy.on_skip_hook(path, prefixed_path, source_storage)
                 return
 
-        self.num_copied_files += 1
-
         existed = prefixed_path in self.copied_files
-        super().copy_file(path, prefixed_path, source_storage)
+        with self.strategy.stats.measure("copy"):
+            if self.collectfast_enabled:
+                self.upload_file(path, prefixed_path, source_storage)
+            else:
+                super().copy_file(path, prefixed_path, source_storage)
         copied = not existed and prefixed_path in self.copied_files
         if copied:
+            self.num_copied_files += 1
             self.strategy.post_copy_hook(path, prefixed_path, source_storage)
         else:
             self.strategy.on_skip_hook(path, prefixed_path, source_storage)
 
+    def should_copy_file(
+        self, path: str, prefixed_path: str, source_storage: Storage
+    ) -> bool:
+        """
+        Let the strategy decide whether to copy a file, unless a plan is being
+        applied, which lists the files to copy. Files are copied if the remote
+        storage keeps throttling the checks.
+        """
+        if self.applied_plan is not None:
+            size = source_storage.size(path)
+            return self.applied_plan.should_upload(prefixed_path, size)
+
+        self.strategy.pre_should_copy_hook()
+        with self.strategy.stats.measure("should_copy"):
+            try:
+                return self.strategy.should_copy_file(
+                    path, prefixed_path, source_storage
+                )
+            except ThrottledError:
+                self.stderr.write(f"Copying '{path}', remote check was throttled")
+                return True
+
+    def add_to_plan(
+        self,
+        plan: Plan,
+        path: str,
+        prefixed_path: str,
+        source_storage: Storage,
+        should_copy: bool,
+    ) -> None:
+        size = source_storage.size(path)
+        if should_copy:
+            self.log(f"Planning to copy '{path}'", level=1)
+            hash_ = self.strategy.get_plan_hash(path, prefixed_path, source_storage)
+            plan.add_upload(prefixed_path, size, hash_)
+        else:
+            self.log(f"Planning to skip '{path}'")
+            plan.add_skip(prefixed_path, size)
+
+    def upload_file(
+        self, path: str, prefixed_path: str, source_storage: Storage
+    ) -> None:
+        """
+        Copy a file like the builtin copy_file(), but let the strategy upload it.
+        The file is skipped if the strategy finds that the upload wasn't needed.
+        """
+        # This method is extracted and modified from the copy_file() method of
+        # the builtin collectstatic command.
+        # https://github.com/django/django/blob/5320ba98f3d253afcaa76b4b388a8982f87d4f1a/django/contrib/staticfiles/management/commands/collectstatic.py
+
+        if prefixed_path in self.copied_files:
+            return self.log(f"Skipping '{path}' (already copied earlier)")
+        if not self.delete_file(path, prefixed_path, source_storage):
+            return
+        if self.dry_run:
+            self.log(f"Pretending to copy '{path}'", level=1)
+        else:
+            self.log(f"Copying '{path}'", level=2)
+            if not self.strategy.copy_file(path, prefixed_path, source_storage):
+                return self.log(f"Skipping '{path}' (unchanged on remote storage)")
+        self.copied_files.append(prefixed_path)
+
     def copy_file(self, path: str, prefixed_path: str, source_storage: Storage) -> None:
         """
         Append path to task queue if threads are enabled, otherwise copy the
-        file with a blocking call.
+        file with a blocking call. When pipelining, the queue is submitted to
+        the thread pool whenever it fills up a batch.
         """
-        args = (path, prefixed_path, source_storage)
-        if settings.threads and self.collectfast_enabled:
+        started = time.perf_counter()
+        try:
+            self.dispatch_copy_file((path, prefixed_path, source_storage))
+        finally:
+            self.dispatch_time += time.perf_counter() - started
+
+    def dispatch_copy_file(self, args: Task) -> None:
+        if self.threads and self.collectfast_enabled:
             self.tasks.append(args)
+            if self.pool is not None and len(self.tasks) >= self.pipeline_batch_size:
+                self.submit_tasks(self.pool, self.tasks)
+                self.tasks = []
         else:
             self.maybe_copy_file(args)
 
+    def link_file(self, path: str, prefixed_path: str, source_storage: Storage) -> None:
+        """Override link_file to make linked files available to post_process."""
+        if self.collectfast_enabled:
+            self.record_found([(path, prefixed_path, source_storage)])
+        super().link_file(path, prefixed_path, source_storage)
+
     def delete_file(
         self, path: str, prefixed_path: str, source_storage: Storage
     ) -> bool:
@@ -138,18 +600,48 @@ class Command(collectstatic.Command):
         if not self.collectfast_enabled:
             return super().delete_file(path, prefixed_path, source_storage)
 
+        # Storages that overwrite existing files in place don't need them to be
+        # deleted before copying.
+        if getattr(self.storage, "file_overwrite", False):
+            return True
+
         if self.dry_run:
             self.log(f"Pretending to delete '{path}'")
             return True
 
         self.log(f"Deleting '{path}' on remote storage")
+        self.strategy.delete_file(prefixed_path)
+        return True
 
-        try:
-            self.storage.delete(prefixed_path)
-        except self.strategy.delete_not_found_exception:
-            pass
+    def clear_dir(self, path: str) -> None:
+        """
+        Override clear_dir to let the strategy delete all files at once rather
+        than one at a time.
+        """
+        if not self.collectfast_enabled or self.dry_run:
+            return super().clear_dir(path)
 
-        return True
+        prefixed_paths = list(self.list_remote_files(path))
+        if self.plan is not None:
+            self.remote_files = prefixed_paths
+            return
+        for prefixed_path in prefixed_paths:
+            self.log(f"Deleting '{prefixed_path}'", level=1)
+        self.strategy.delete_files(prefixed_paths)
+
+    def delete_planned_files(self, plan: Plan) -> None:
+        for prefixed_path in plan.delete:
+            self.log(f"Deleting '{prefixed_path}'", level=1)
+        self.strategy.delete_files(plan.delete)
+
+    def list_remote_files(self, path: str) -> Iterator[str]:
+        if not self.storage.exists(path):
+            return
+        dirs, files = self.storage.listdir(path)
+        for file in files:
+            yield os.path.join(path, file)
+        for directory in dirs:
+            yield from self.list_remote_files(os.path.join(path, directory))
 
     def maybe_post_process(self, super_post_process: bool) -> None:
         # This method is extracted and modified from the collect() method of the
@@ -159,7 +651,19 @@ class Command(collectstatic.Command):
         if not super_post_process or not hasattr(self.storage, "post_process"):
             return
 
-        processor = self.storage.post_process(self.found_files, dry_run=self.dry_run)
+        if (
+            settings.incremental_post_process
+            and isinstance(self.storage, ManifestFilesMixin)
+            and not self.dry_run
+        ):
+            copied_files = set(self.copied_files) | self.shard_copied_files
+            processor = post_process_incrementally(
+                self.storage, self.found_files, copied_files
+            )
+        else:
+            processor = self.storage.post_process(
+                self.found_files, dry_run=self.dry_run
+            )
 
         for original_path, processed_path, processed in processor:
             if isinstance(processed, Exception):
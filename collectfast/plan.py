@@ -0,0 +1,92 @@
+"""
+Plans of the transfers of a collectstatic run, computed by --plan and carried
+out by --apply.
+"""
+
+import json
+import threading
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from django.core.management.base import CommandError
+
+from collectfast.stats import format_bytes
+
+
+class Plan:
+    """
+    Files to upload, files to skip and files to delete, keyed by prefixed path.
+    Uploads and skips are mapped to the size of the local file and uploads to
+    its hash too, if the strategy computed one.
+    """
+
+    version = 1
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.upload: Dict[str, Dict[str, Any]] = {}
+        self.skip: Dict[str, int] = {}
+        self.delete: List[str] = []
+
+    def add_upload(self, prefixed_path: str, size: int, hash_: Optional[str]) -> None:
+        with self._lock:
+            self.upload[prefixed_path] = {"size": size, "hash": hash_}
+
+    def add_skip(self, prefixed_path: str, size: int) -> None:
+        with self._lock:
+            self.skip[prefixed_path] = size
+
+    def should_upload(self, prefixed_path: str, size: int) -> bool:
+        """
+        Return whether the plan lists a file for upload. Raise CommandError if
+        its size changed since the plan was computed.
+        """
+        entry = self.upload.get(prefixed_path)
+        if entry is None:
+            return False
+        if entry["size"] != size:
+            raise CommandError(
+                f"'{prefixed_path}' changed since the plan was computed, expected "
+                f"{entry['size']} bytes but found {size}."
+            )
+        return True
+
+    @property
+    def upload_bytes(self) -> int:
+        return sum(entry["size"] for entry in self.upload.values())
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.upload)} to upload ({format_bytes(self.upload_bytes)}), "
+            f"{len(self.skip)} to skip, {len(self.delete)} to delete"
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "upload": self.upload,
+            "skip": self.skip,
+            "delete": self.delete,
+            "upload_bytes": self.upload_bytes,
+        }
+
+    def save(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, separators=(",", ":"), sort_keys=True)
+
+    @classmethod
+    def load(cls, path: str) -> "Plan":
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not read plan {path}: {exc}")
+        if not isinstance(data, dict) or data.get("version") != cls.version:
+            raise CommandError(f"Unsupported plan version in {path}.")
+        plan = cls()
+        plan.upload = data["upload"]
+        plan.skip = data["skip"]
+        plan.delete = data["delete"]
+        return plan
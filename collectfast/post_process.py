@@ -0,0 +1,93 @@
+"""
+Incremental post-processing for storages keeping a manifest of hashed names.
+"""
+
+import logging
+import posixpath
+from typing import Dict
+from typing import Iterator
+from typing import Set
+from typing import Tuple
+
+from django.contrib.staticfiles.storage import ManifestFilesMixin
+from django.contrib.staticfiles.utils import matches_patterns
+from django.core.files.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+FoundFiles = Dict[str, Tuple[Storage, str]]
+
+
+def read_text(found_files: FoundFiles, prefixed_path: str) -> str:
+    source_storage, path = found_files[prefixed_path]
+    with source_storage.open(path) as file:
+        contents: bytes = file.read()
+    return contents.decode(errors="ignore")
+
+
+def find_dependents(
+    storage: ManifestFilesMixin, found_files: FoundFiles, changed: Set[str]
+) -> Set[str]:
+    """
+    Return the adjustable files, like CSS files, that reference any of changed,
+    directly or through other dependents. References are detected by the file
+    name appearing in the contents, which may select more files than strictly
+    needed but never fewer.
+    """
+    candidates = {
+        prefixed_path
+        for prefixed_path in found_files
+        if prefixed_path not in changed
+        and matches_patterns(prefixed_path, storage._patterns)
+    }
+    contents: Dict[str, str] = {}
+    dependents: Set[str] = set()
+    names = {posixpath.basename(prefixed_path) for prefixed_path in changed}
+    while names and candidates:
+        found = set()
+        for prefixed_path in candidates:
+            if prefixed_path not in contents:
+                contents[prefixed_path] = read_text(found_files, prefixed_path)
+            if any(name in contents[prefixed_path] for name in names):
+                found.add(prefixed_path)
+        dependents |= found
+        candidates -= found
+        names = {posixpath.basename(prefixed_path) for prefixed_path in found}
+    return dependents
+
+
+def post_process_incrementally(
+    storage: ManifestFilesMixin, found_files: FoundFiles, copied_files: Set[str]
+) -> Iterator[Tuple[str, str, bool]]:
+    """
+    Post-process only the files that were copied in this run or are missing
+    from the manifest of the previous run, along with their dependents. Hashed
+    names of all other files are kept from the previous manifest.
+
+    Unlike storage.post_process(), this runs the post-processing of
+    HashedFilesMixin directly, so additional processing added by subclasses of
+    ManifestFilesMixin is skipped.
+    """
+    previous = storage.hashed_files
+    changed = {
+        prefixed_path
+        for prefixed_path in found_files
+        if prefixed_path in copied_files
+        or storage.hash_key(prefixed_path) not in previous
+    }
+    changed |= find_dependents(storage, found_files, changed)
+    logger.debug(
+        "Post-processing changed files",
+        extra={"changed": len(changed), "total": len(found_files)},
+    )
+
+    # Entries of files that no longer exist are dropped, like a full run would.
+    keys = {storage.hash_key(prefixed_path) for prefixed_path in found_files}
+    storage.hashed_files = {key: name for key, name in previous.items() if key in keys}
+    if not changed and storage.hashed_files == previous:
+        return
+    # HashedFilesMixin.post_process adds the new hashed names to
+    # storage.hashed_files once done.
+    paths = {prefixed_path: found_files[prefixed_path] for prefixed_path in changed}
+    yield from super(ManifestFilesMixin, storage).post_process(paths)
+    storage.save_manifest()
@@ -0,0 +1,99 @@
+import json
+import logging
+import threading
+from typing import Dict
+from typing import Iterable
+from typing import Optional
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteManifest:
+    """
+    Mapping from paths to hashes of the files in a remote storage, kept as a
+    single object in the storage itself so that runs without a shared cache
+    don't need to look up every file. It's read on the first lookup and
+    rewritten at the end of the run.
+    """
+
+    version = 1
+
+    def __init__(self, storage: Storage, name: str) -> None:
+        self.storage = storage
+        self.name = name
+        self._lock = threading.Lock()
+        self._hashes: Optional[Dict[str, str]] = None
+        # Once a manifest has been written, files missing from it are known not
+        # to exist remotely.
+        self._complete = False
+        self._changed = False
+
+    def _load(self) -> Optional[Dict[str, str]]:
+        try:
+            with self.storage.open(self.name) as file:
+                data = json.loads(file.read())
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            logger.warning("Ignoring corrupt remote manifest %s", self.name)
+            return None
+        if data.get("version") != self.version:
+            return None
+        hashes: Dict[str, str] = data["hashes"]
+        return hashes
+
+    def _get_hashes(self) -> Dict[str, str]:
+        if self._hashes is None:
+            logger.debug("Loading remote manifest", extra={"name": self.name})
+            hashes = self._load()
+            self._complete = hashes is not None
+            self._hashes = hashes or {}
+        return self._hashes
+
+    def lookup(self, path: str) -> Optional[str]:
+        """
+        Return the hash of a remote file, or None if it doesn't exist. Raise
+        KeyError if the manifest doesn't know about the file.
+        """
+        with self._lock:
+            hashes = self._get_hashes()
+            if path in hashes:
+                return hashes[path]
+            if self._complete:
+                return None
+        raise KeyError(path)
+
+    def entries(self, paths: Iterable[str]) -> Dict[str, str]:
+        """Return the hashes of the given paths that the manifest knows about."""
+        with self._lock:
+            hashes = self._get_hashes()
+            return {path: hashes[path] for path in paths if path in hashes}
+
+    def set(self, path: str, hash_: Optional[str]) -> None:
+        with self._lock:
+            hashes = self._get_hashes()
+            if hash_ is None:
+                if hashes.pop(path, None) is not None:
+                    self._changed = True
+            elif hashes.get(path) != hash_:
+                hashes[path] = hash_
+                self._changed = True
+
+    def save(self) -> None:
+        """
+        Replace the manifest object if any entries changed, or if it doesn't
+        exist yet. Storages overwriting files replace it atomically.
+        """
+        with self._lock:
+            if self._hashes is None or (self._complete and not self._changed):
+                return
+            data = {"version": self.version, "hashes": self._hashes}
+            contents = json.dumps(data, separators=(",", ":"), sort_keys=True)
+            if not getattr(self.storage, "file_overwrite", False):
+                self.storage.delete(self.name)
+            self.storage.save(self.name, ContentFile(contents.encode()))
+            self._complete = True
+            self._changed = False
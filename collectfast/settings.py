@@ -24,9 +24,48 @@ cache_key_prefix: Final = _get_setting(
     str, "COLLECTFAST_CACHE_KEY_PREFIX", "collectfast06_asset_"
 )
 cache: Final = _get_setting(str, "COLLECTFAST_CACHE", "default")
-threads: Final = _get_setting(int, "COLLECTFAST_THREADS", 0)
+cache_batch_size: Final = _get_setting(int, "COLLECTFAST_CACHE_BATCH_SIZE", 0)
+# With COLLECTFAST_THREADS = "auto", threads is the upper bound of the search
+# for the number of concurrent requests.
+auto_threads: Final = getattr(settings, "COLLECTFAST_THREADS", 0) == "auto"
+threads: Final = (
+    _get_setting(int, "COLLECTFAST_AUTO_THREADS_MAX", 64)
+    if auto_threads
+    else _get_setting(int, "COLLECTFAST_THREADS", 0)
+)
+remember_threads: Final = _get_setting(bool, "COLLECTFAST_REMEMBER_THREADS", False)
+pipeline: Final = _get_setting(bool, "COLLECTFAST_PIPELINE", False)
 enabled: Final = _get_setting(bool, "COLLECTFAST_ENABLED", True)
+preload_remote_hashes: Final = _get_setting(
+    bool, "COLLECTFAST_PRELOAD_REMOTE_HASHES", False
+)
+hash_chunk_size: Final = _get_setting(int, "COLLECTFAST_HASH_CHUNK_SIZE", 64 * 1024)
+hash_processes: Final = _get_setting(int, "COLLECTFAST_HASH_PROCESSES", 0)
+local_hash_index: Final = _get_setting(bool, "COLLECTFAST_LOCAL_HASH_INDEX", False)
+local_hash_index_path: Final = _get_setting(
+    str, "COLLECTFAST_LOCAL_HASH_INDEX_PATH", ""
+)
+immutable_file_pattern: Final = _get_setting(
+    str, "COLLECTFAST_IMMUTABLE_FILE_PATTERN", ""
+)
+incremental_post_process: Final = _get_setting(
+    bool, "COLLECTFAST_INCREMENTAL_POST_PROCESS", False
+)
+remote_manifest: Final = _get_setting(str, "COLLECTFAST_REMOTE_MANIFEST", "")
+throttle_retries: Final = _get_setting(int, "COLLECTFAST_THROTTLE_RETRIES", 5)
+shard_timeout: Final = _get_setting(int, "COLLECTFAST_SHARD_TIMEOUT", 3600)
+server_side_copy: Final = _get_setting(bool, "COLLECTFAST_SERVER_SIDE_COPY", False)
+size_prefilter: Final = _get_setting(bool, "COLLECTFAST_SIZE_PREFILTER", False)
 aws_is_gzipped: Final = _get_setting(bool, "AWS_IS_GZIPPED", False)
+aws_multipart_chunksize: Final = _get_setting(
+    int, "COLLECTFAST_AWS_MULTIPART_CHUNKSIZE", 0
+)
+compressed_spool_size: Final = _get_setting(
+    int, "COLLECTFAST_COMPRESSED_SPOOL_SIZE", 1024 * 1024
+)
+aws_conditional_writes: Final = _get_setting(
+    bool, "COLLECTFAST_AWS_CONDITIONAL_WRITES", False
+)
 gzip_content_types: Final[Container] = _get_setting(
     tuple,
     "GZIP_CONTENT_TYPES",
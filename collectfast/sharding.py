@@ -0,0 +1,100 @@
+"""
+Splitting of the collected files between the shards of a sharded run, and the
+markers the shards leave in the remote storage once they're done.
+"""
+
+import hashlib
+import heapq
+import json
+import posixpath
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.core.management.base import CommandError
+
+Task = Tuple[str, str, Storage]
+
+# Directory of the remote storage holding the markers of finished shards.
+MARKER_DIR = ".collectfast-shards"
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse a shard given as i/N into its index and the number of shards."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise CommandError(f"Invalid shard {value!r}, expected i/N.")
+    if not 0 <= index < count:
+        raise CommandError(f"Invalid shard {value!r}, i must be in [0, N).")
+    return index, count
+
+
+def split_tasks(tasks: Sequence[Task], count: int) -> List[List[Task]]:
+    """
+    Split tasks into count shards of about the same number of bytes. Files are
+    assigned from largest to smallest to the shard with the fewest bytes so
+    far, files of the same size being ordered by the hash of their prefixed
+    path, so that every node computes the same split from the same files.
+    """
+    sized = []
+    for task in tasks:
+        path, prefixed_path, source_storage = task
+        key = hashlib.md5(prefixed_path.encode()).hexdigest()
+        sized.append((source_storage.size(path), key, task))
+    sized.sort(key=lambda item: (-item[0], item[1]))
+
+    shards: List[List[Task]] = [[] for _ in range(count)]
+    loads = [(0, index) for index in range(count)]
+    for size, _key, task in sized:
+        load, index = heapq.heappop(loads)
+        shards[index].append(task)
+        heapq.heappush(loads, (load + size, index))
+    return shards
+
+
+def get_modified_time(path: str, source_storage: Storage) -> str:
+    try:
+        return source_storage.get_modified_time(path).isoformat()
+    except NotImplementedError:
+        return ""
+
+
+def run_key(tasks: Sequence[Task], count: int) -> str:
+    """
+    Identify a sharded run by the collected files and their sizes and
+    modification times, which are the same on all nodes deploying the same
+    build artifact and differ between builds. Files aren't read, so that
+    shards don't have to hash all files before splitting them.
+    """
+    hash_ = hashlib.md5(str(count).encode())
+    for path, prefixed_path, source_storage in sorted(tasks, key=lambda t: t[1]):
+        size = source_storage.size(path)
+        modified_time = get_modified_time(path, source_storage)
+        hash_.update(f"{prefixed_path}\0{size}\0{modified_time}\0".encode())
+    return hash_.hexdigest()
+
+
+def named_run_key(name: str, count: int) -> str:
+    """Identify a sharded run by a name given on all nodes, like a build id."""
+    return hashlib.md5(f"{count}\0{name}".encode()).hexdigest()
+
+
+def marker_name(key: str, index: int) -> str:
+    return posixpath.join(MARKER_DIR, key, f"{index}.json")
+
+
+def save_marker(storage: Storage, name: str, state: Dict[str, Any]) -> None:
+    if not getattr(storage, "file_overwrite", False) and storage.exists(name):
+        storage.delete(name)
+    storage.save(name, ContentFile(json.dumps(state).encode()))
+
+
+def load_marker(storage: Storage, name: str) -> Dict[str, Any]:
+    with storage.open(name) as file:
+        state: Dict[str, Any] = json.loads(file.read())
+    return state
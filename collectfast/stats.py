@@ -0,0 +1,129 @@
+"""
+Timings and byte counters collected during a collectstatic run.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
+from typing import Dict
+from typing import Iterator
+from typing import List
+
+from typing_extensions import Final
+
+# Upper bounds in seconds of the latency histogram buckets. Durations above the
+# last bound are counted in an overflow bucket.
+BUCKETS: Final = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5)
+
+
+def format_bytes(count: int) -> str:
+    value = float(count)
+    for unit in ("B", "kB", "MB", "GB"):
+        if value < 1000:
+            break
+        value /= 1000
+    else:
+        unit = "TB"
+    return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+
+
+class Histogram:
+    """Latency histogram with fixed buckets."""
+
+    def __init__(self) -> None:
+        self.counts: List[int] = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def as_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound}" for bound in BUCKETS] + [f">{BUCKETS[-1]}"]
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class Stats:
+    """
+    Thread safe collection of the wall time of each phase of a run, latency
+    histograms of per-file operations, counts of bytes read, hashed and
+    uploaded, and counts of events like throttled requests.
+    """
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.phases: Dict[str, float] = {}
+        self.latencies: Dict[str, Histogram] = {}
+        self.bytes: Dict[str, int] = {"read": 0, "hashed": 0, "uploaded": 0}
+        self.counts: Dict[str, int] = {}
+
+    def add_time(self, phase: str, seconds: float) -> None:
+        with self.lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_latency(self, operation: str, seconds: float) -> None:
+        with self.lock:
+            self.latencies.setdefault(operation, Histogram()).add(seconds)
+
+    def add_bytes(self, kind: str, count: int) -> None:
+        with self.lock:
+            self.bytes[kind] = self.bytes.get(kind, 0) + count
+
+    def add_count(self, event: str) -> None:
+        with self.lock:
+            self.counts[event] = self.counts.get(event, 0) + 1
+
+    @contextmanager
+    def phase(self, phase: str) -> Iterator[None]:
+        """Add the wall time spent in the block to phase."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(phase, time.perf_counter() - started)
+
+    @contextmanager
+    def measure(self, operation: str) -> Iterator[None]:
+        """Add the duration of the block to the latency histogram of operation."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_latency(operation, time.perf_counter() - started)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "phases": dict(self.phases),
+                "latencies": {
+                    operation: histogram.as_dict()
+                    for operation, histogram in self.latencies.items()
+                },
+                "bytes": dict(self.bytes),
+                "counts": dict(self.counts),
+            }
+
+    def summary(self) -> str:
+        phases = ", ".join(
+            f"{phase.replace('_', '-')} {seconds:.2f}s"
+            for phase, seconds in self.phases.items()
+            if phase != "collect"
+        )
+        counts = ", ".join(
+            f"{format_bytes(count)} {kind}" for kind, count in self.bytes.items()
+        )
+        events = "".join(f", {count} {event}" for event, count in self.counts.items())
+        total = self.phases.get("collect", 0.0)
+        return f"Took {total:.2f}s ({phases}); {counts}{events}."
@@ -1,15 +1,31 @@
 import abc
-import gzip
 import hashlib
 import logging
 import mimetypes
+import multiprocessing
 import pydoc
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
-from io import BytesIO
+from functools import partial
+from typing import IO
+from typing import Any
+from typing import Callable
 from typing import ClassVar
+from typing import Dict
 from typing import Generic
+from typing import Iterator
+from typing import List
 from typing import NoReturn
 from typing import Optional
+from typing import Pattern
+from typing import Sequence
+from typing import Set
 from typing import Tuple
 from typing import Type
 from typing import TypeVar
@@ -18,24 +34,55 @@ from typing import Union
 from django.core.cache import caches
 from django.core.exceptions import ImproperlyConfigured
 from django.core.files.storage import Storage
-from django.utils.encoding import force_bytes
 
 from collectfast import settings
+from collectfast.hash_index import LocalHashIndex
+from collectfast.hash_index import get_index_path
+from collectfast.hashing import Entry
+from collectfast.hashing import HashFactory
+from collectfast.hashing import hash_files
+from collectfast.hashing import open_gzip_writer
+from collectfast.hashing import read_chunks
+from collectfast.remote_manifest import RemoteManifest
+from collectfast.stats import Stats
+from collectfast.throttling import AdaptiveLimiter
+from collectfast.throttling import ThrottledError
+from collectfast.throttling import backoff_delay
 
 _RemoteStorage = TypeVar("_RemoteStorage", bound=Storage)
+T = TypeVar("T")
 
 
 cache = caches[settings.cache]
 logger = logging.getLogger(__name__)
 
 
+def batched(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    """Split items into consecutive batches of at most size items."""
+    for start in range(0, len(items), size):
+        end = start + size
+        yield items[start:end]
+
+
 class Strategy(abc.ABC, Generic[_RemoteStorage]):
     # Exceptions raised by storage backend for delete calls to non-existing
     # objects. The command silently catches these.
     delete_not_found_exception: ClassVar[Tuple[Type[Exception], ...]] = ()
+    # Base and maximum delay in seconds before retrying throttled requests.
+    throttle_backoff: ClassVar[float] = 0.1
+    throttle_backoff_cap: ClassVar[float] = 10.0
 
     def __init__(self, remote_storage: _RemoteStorage) -> None:
         self.remote_storage = remote_storage
+        self.stats = Stats()
+        self.limiter = AdaptiveLimiter(settings.threads or 1)
+        # Whether should_copy_file() may leave checks to copy_file(). Disabled
+        # when decisions are only planned and not carried out.
+        self.defer_checks = True
+        # Whether post_collect_hook() may write state shared by all files to the
+        # remote storage. Disabled for all but the designated shard of a
+        # sharded run.
+        self.write_shared_state = True
 
     @abc.abstractmethod
     def should_copy_file(
@@ -65,101 +112,758 @@ class Strategy(abc.ABC, Generic[_RemoteStorage]):
         """Hook called when a file copy is skipped."""
         ...
 
+    def on_discover_hook(self, files: Sequence[Tuple[str, str, Storage]]) -> None:
+        """
+        Hook called with batches of (path, prefixed_path, local_storage) tuples
+        of discovered files before they are copied. Only called when threads
+        are enabled.
+        """
+        ...
+
+    def post_collect_hook(self) -> None:
+        """Hook called after all files have been collected."""
+        ...
+
+    def get_plan_hash(
+        self, path: str, prefixed_path: str, local_storage: Storage
+    ) -> Optional[str]:
+        """Return the hash of a local file to record in plans, if any."""
+        return None
+
+    def export_remote_hashes(self, prefixed_paths: Sequence[str]) -> Dict[str, str]:
+        """
+        Return the known remote hashes of files, for the designated shard of a
+        sharded run to import.
+        """
+        return {}
+
+    def import_remote_hashes(self, hashes: Dict[str, str]) -> None:
+        """Record remote hashes exported by another shard."""
+        ...
+
+    def is_throttling_error(self, error: Exception) -> bool:
+        """Return True if error tells that the provider throttled a request."""
+        return False
+
+    def remote_call(self, operation: str, function: Callable[[], T]) -> T:
+        """
+        Make a remote request within the concurrency limit. Throttled requests
+        are retried after a jittered exponential backoff, up to
+        COLLECTFAST_THROTTLE_RETRIES times before raising ThrottledError.
+        """
+        for attempt in range(settings.throttle_retries + 1):
+            if attempt:
+                delay = backoff_delay(
+                    attempt - 1, self.throttle_backoff, self.throttle_backoff_cap
+                )
+                logger.debug("Retrying throttled request", extra={"delay": delay})
+                time.sleep(delay)
+            with self.limiter.slot() as epoch:
+                started = time.perf_counter()
+                try:
+                    result = function()
+                except Exception as error:
+                    if not self.is_throttling_error(error):
+                        raise
+                    self.limiter.on_throttle(epoch)
+                    self.stats.add_count("throttled")
+                    last_error = error
+                else:
+                    self.limiter.on_success(operation, time.perf_counter() - started)
+                    return result
+        raise ThrottledError(f"{operation} request throttled") from last_error
+
+    def copy_file(self, path: str, prefixed_path: str, local_storage: Storage) -> bool:
+        """
+        Upload a file to the remote storage. Return False if the upload turned
+        out to be unnecessary, the file is then treated as skipped.
+        """
+        self.save_file(path, prefixed_path, local_storage)
+        return True
+
+    def save_file(self, path: str, prefixed_path: str, local_storage: Storage) -> None:
+        with local_storage.open(path) as source_file:
+
+            def save() -> None:
+                source_file.seek(0)
+                self.remote_storage.save(prefixed_path, source_file)
+
+            self.remote_call("save", save)
+            self.stats.add_bytes("uploaded", source_file.size)
+
+    def delete_files(self, prefixed_paths: Sequence[str]) -> None:
+        """
+        Delete files from the remote storage, concurrently if threads are
+        enabled. Strategies can override this to use bulk deletes.
+        """
+        with ThreadPoolExecutor(settings.threads or 1) as pool:
+            # Consume results to propagate exceptions.
+            list(pool.map(self.delete_file, prefixed_paths))
+
+    def delete_file(self, prefixed_path: str) -> None:
+        try:
+            self.remote_call(
+                "delete", lambda: self.remote_storage.delete(prefixed_path)
+            )
+        except self.delete_not_found_exception:
+            pass
+
 
 class HashStrategy(Strategy[_RemoteStorage], abc.ABC):
     use_gzip = False
+    # Whether gzipped contents produced while hashing are kept for the upload,
+    # see pop_compressed().
+    keep_compressed = False
+    # Creates the hash objects used for local files. They must produce the
+    # same digest as the remote storage reports for the uploaded contents. The
+    # factory is passed to worker processes and so must be picklable.
+    hash_factory: HashFactory = hashlib.md5
+    # Whether get_remote_file_size() only knows sizes returned by a previous
+    # remote hash lookup. Otherwise sizes are compared before looking up hashes.
+    remote_size_from_lookup = True
+
+    def __init__(self, remote_storage: _RemoteStorage) -> None:
+        super().__init__(remote_storage)
+        self.local_hash_index: Optional[LocalHashIndex] = None
+        if settings.local_hash_index:
+            self.local_hash_index = LocalHashIndex(
+                get_index_path(), self.get_hash_identity()
+            )
+        self.hash_pool: Optional[ProcessPoolExecutor] = None
+        self.pending_hashes: Dict[Tuple[str, Storage], Tuple[Future, int]] = {}
+        self.immutable_pattern: Optional[Pattern[str]] = None
+        if settings.immutable_file_pattern:
+            self.immutable_pattern = re.compile(settings.immutable_file_pattern)
+        self.remote_manifest: Optional[RemoteManifest] = None
+        if settings.remote_manifest:
+            self.remote_manifest = RemoteManifest(
+                remote_storage, settings.remote_manifest
+            )
+        # Uploads of each unique content in this run, resolving to the path it
+        # was uploaded to. See copy_file().
+        self._uploads: Dict[Tuple[str, Optional[str]], "Future[str]"] = {}
+        self._uploads_lock = threading.Lock()
+        self._compressed: Dict[Tuple[str, Storage], IO[bytes]] = {}
+        self._compressed_lock = threading.Lock()
 
     def should_copy_file(
         self, path: str, prefixed_path: str, local_storage: Storage
     ) -> bool:
-        local_hash = self.get_local_file_hash(path, local_storage)
-        remote_hash = self.get_remote_file_hash(prefixed_path)
-        return local_hash != remote_hash
+        if self.is_immutable(prefixed_path):
+            return not self.remote_file_exists(path, prefixed_path)
+        return self.is_stale(
+            path, prefixed_path, local_storage, self.measure_remote_file_hash
+        )
+
+    def measure_remote_file_hash(self, prefixed_path: str) -> Optional[str]:
+        with self.stats.measure("remote_hash"):
+            return self.fetch_remote_file_hash(prefixed_path)
+
+    def is_stale(
+        self,
+        path: str,
+        prefixed_path: str,
+        local_storage: Storage,
+        get_remote_hash: Callable[[str], Optional[str]],
+    ) -> bool:
+        """
+        Compare a file by size, then by hash. Sizes are compared before the
+        remote hash is requested with get_remote_hash, unless the remote size is
+        only known from that request.
+        """
+        sizes_first = not self.remote_size_from_lookup
+        if sizes_first and self.sizes_differ(path, prefixed_path, local_storage):
+            return True
+        remote_hash = get_remote_hash(prefixed_path)
+        if not sizes_first and self.sizes_differ(path, prefixed_path, local_storage):
+            return True
+        return self.get_local_file_hash(path, local_storage) != remote_hash
+
+    def is_immutable(self, prefixed_path: str) -> bool:
+        """
+        Return True if the name of the file matches
+        COLLECTFAST_IMMUTABLE_FILE_PATTERN, meaning it's derived from the
+        contents. Such files are up to date if they exist remotely.
+        """
+        pattern = self.immutable_pattern
+        return pattern is not None and pattern.search(prefixed_path) is not None
+
+    def remote_file_exists(self, path: str, prefixed_path: str) -> bool:
+        with self.stats.measure("remote_hash"):
+            return self.fetch_remote_file_hash(prefixed_path) is not None
+
+    def fetch_remote_file_hash(self, prefixed_path: str) -> Optional[str]:
+        """
+        Look up the hash of a remote file in the remote manifest if enabled,
+        falling back to asking the remote storage.
+        """
+        if self.remote_manifest is None:
+            return self.get_remote_file_hash(prefixed_path)
+        try:
+            return self.remote_manifest.lookup(prefixed_path)
+        except KeyError:
+            pass
+        hash_ = self.get_remote_file_hash(prefixed_path)
+        self.remote_manifest.set(prefixed_path, hash_)
+        return hash_
+
+    def delete_file(self, prefixed_path: str) -> None:
+        super().delete_file(prefixed_path)
+        self.forget_remote_files([prefixed_path])
+
+    def forget_remote_files(self, prefixed_paths: Sequence[str]) -> None:
+        """
+        Drop deleted files from the remote manifest. Strategies deleting files
+        without delete_file() must call this.
+        """
+        if self.remote_manifest is None:
+            return
+        for prefixed_path in prefixed_paths:
+            self.remote_manifest.set(prefixed_path, None)
+
+    def export_remote_hashes(self, prefixed_paths: Sequence[str]) -> Dict[str, str]:
+        if self.remote_manifest is None:
+            return {}
+        return self.remote_manifest.entries(prefixed_paths)
+
+    def import_remote_hashes(self, hashes: Dict[str, str]) -> None:
+        if self.remote_manifest is None:
+            return
+        for prefixed_path, hash_ in hashes.items():
+            self.remote_manifest.set(prefixed_path, hash_)
+
+    def post_copy_hook(
+        self, path: str, prefixed_path: str, local_storage: Storage
+    ) -> None:
+        """
+        Record the hash of the just copied file in the remote manifest. Files
+        with content-hashed names aren't hashed and are recorded with an empty
+        hash, which only tells that they exist.
+        """
+        super().post_copy_hook(path, prefixed_path, local_storage)
+        self.discard_compressed(path, local_storage)
+        if self.remote_manifest is not None:
+            self.record_remote_file_hash(path, prefixed_path, local_storage)
+
+    def on_skip_hook(
+        self, path: str, prefixed_path: str, local_storage: Storage
+    ) -> None:
+        """
+        Record skipped files that are missing from the remote manifest, e.g.
+        because their hashes were found in the cache.
+        """
+        super().on_skip_hook(path, prefixed_path, local_storage)
+        self.discard_compressed(path, local_storage)
+        if self.remote_manifest is None:
+            return
+        try:
+            known = self.remote_manifest.lookup(prefixed_path) is not None
+        except KeyError:
+            known = False
+        if not known:
+            self.record_remote_file_hash(path, prefixed_path, local_storage)
+
+    def record_remote_file_hash(
+        self, path: str, prefixed_path: str, local_storage: Storage
+    ) -> None:
+        assert self.remote_manifest is not None
+        hash_ = ""
+        if not self.is_immutable(prefixed_path):
+            hash_ = self.get_local_file_hash(path, local_storage)
+        self.remote_manifest.set(prefixed_path, hash_)
+
+    def sizes_differ(
+        self, path: str, prefixed_path: str, local_storage: Storage
+    ) -> bool:
+        """
+        Return True if the local and remote file are known to have different
+        sizes, meaning the file can be copied without hashing it. Sizes are only
+        compared when COLLECTFAST_SIZE_PREFILTER is enabled, and never for files
+        that are gzipped on upload.
+        """
+        if not settings.size_prefilter or self.should_gzip(path):
+            return False
+        remote_size = self.get_remote_file_size(prefixed_path)
+        return remote_size is not None and remote_size != local_storage.size(path)
+
+    def should_gzip(self, path: str) -> bool:
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return self.use_gzip and content_type in settings.gzip_content_types
+
+    def read_file(
+        self, path: str, local_storage: Storage, write: Callable[[bytes], Any]
+    ) -> int:
+        """
+        Pass file contents to write in chunks, closing the file when done.
+        Return the number of bytes read. Files of storages with paths on the
+        file system are read into a reused buffer, and write must not keep the
+        chunks it's passed.
+        """
+        try:
+            filesystem_path = local_storage.path(path)
+        except NotImplementedError:
+            file = local_storage.open(path)
+            chunks = iter(lambda: file.read(settings.hash_chunk_size), b"")
+        else:
+            file = open(filesystem_path, "rb", buffering=0)
+            chunks = read_chunks(file, settings.hash_chunk_size)
+        size = 0
+        try:
+            for chunk in chunks:
+                write(chunk)
+                size += len(chunk)
+        finally:
+            file.close()
+        self.stats.add_bytes("read", size)
+        return size
 
     def get_gzipped_local_file_hash(
-        self, uncompressed_file_hash: str, path: str, contents: str
+        self, uncompressed_file_hash: str, path: str, local_storage: Storage
     ) -> str:
-        buffer = BytesIO()
-        zf = gzip.GzipFile(mode="wb", fileobj=buffer, mtime=0.0)
-        zf.write(force_bytes(contents))
-        zf.close()
-        return hashlib.md5(buffer.getvalue()).hexdigest()
+        """
+        Create md5 hash from gzipped file contents. The contents are only kept,
+        spooled to disk above COLLECTFAST_COMPRESSED_SPOOL_SIZE bytes, if the
+        strategy can upload them.
+        """
+        hash_ = self.hash_factory()
+        spool = self.create_spool()
+        with open_gzip_writer(hash_, spool) as zf:
+            size = self.read_file(path, local_storage, zf.write)
+        self.stats.add_bytes("hashed", size)
+        self.keep_compressed_spool(path, local_storage, spool)
+        return hash_.hexdigest()
+
+    def create_spool(self) -> Optional[IO[bytes]]:
+        if not self.keep_compressed:
+            return None
+        return tempfile.SpooledTemporaryFile(settings.compressed_spool_size)
+
+    def keep_compressed_spool(
+        self, path: str, local_storage: Storage, spool: Optional[IO[bytes]]
+    ) -> None:
+        if spool is not None:
+            with self._compressed_lock:
+                self._compressed[(path, local_storage)] = spool
+
+    def pop_compressed(self, path: str, local_storage: Storage) -> Optional[IO[bytes]]:
+        """
+        Return the gzipped contents of a file kept from hashing it, if any. The
+        caller closes the returned file.
+        """
+        with self._compressed_lock:
+            spool = self._compressed.pop((path, local_storage), None)
+        if spool is not None:
+            spool.seek(0)
+        return spool
+
+    def discard_compressed(self, path: str, local_storage: Storage) -> None:
+        spool = self.pop_compressed(path, local_storage)
+        if spool is not None:
+            spool.close()
+
+    def on_discover_hook(self, files: Sequence[Tuple[str, str, Storage]]) -> None:
+        super().on_discover_hook(files)
+        if settings.hash_processes:
+            self.submit_hash_jobs(files)
+
+    def get_hash_jobs(
+        self, files: Sequence[Tuple[str, str, Storage]]
+    ) -> List[Tuple[str, Storage, str, bool]]:
+        """
+        Return (path, local_storage, filesystem_path, gzipped) for all files that
+        can be hashed in a worker process and aren't in the local hash index.
+        """
+        jobs = []
+        for path, prefixed_path, local_storage in files:
+            if self.is_immutable(prefixed_path):
+                continue
+            try:
+                filesystem_path = local_storage.path(path)
+            except NotImplementedError:
+                continue
+            gzipped = self.should_gzip(path)
+            hashes = self.get_indexed_hashes(filesystem_path)
+            if "md5" not in hashes or (gzipped and "gzip" not in hashes):
+                jobs.append((path, local_storage, filesystem_path, gzipped))
+        return jobs
+
+    def submit_hash_jobs(self, files: Sequence[Tuple[str, str, Storage]]) -> None:
+        """
+        Hash files in worker processes, in batches. Results are picked up by
+        get_local_file_hash().
+        """
+        jobs = self.get_hash_jobs(files)
+        if not jobs:
+            return
+
+        if self.hash_pool is None:
+            # The command runs threads by now, which forked processes could
+            # deadlock on. Workers only import collectfast.hashing.
+            self.hash_pool = ProcessPoolExecutor(
+                settings.hash_processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        batch_size = max(1, min(64, len(jobs) // (settings.hash_processes * 4)))
+        for batch in batched(jobs, batch_size):
+            future = self.hash_pool.submit(
+                hash_files,
+                [
+                    (filesystem_path, gzipped)
+                    for _, _, filesystem_path, gzipped in batch
+                ],
+                self.hash_factory,
+                settings.hash_chunk_size,
+            )
+            for i, (path, local_storage, _, _) in enumerate(batch):
+                self.pending_hashes[(path, local_storage)] = (future, i)
+
+    def get_hash_identity(self) -> str:
+        """
+        Identify how local hashes are computed, hashes of the local hash index
+        are only reused by strategies with the same identity.
+        """
+        strategy_class = self.__class__
+        return f"{strategy_class.__module__}.{strategy_class.__qualname__}"
+
+    def get_indexed_hashes(self, filesystem_path: str) -> Entry:
+        if self.local_hash_index is None:
+            return {}
+        return self.local_hash_index.get(filesystem_path)
+
+    def get_stored_hashes(self, path: str, local_storage: Storage) -> Entry:
+        """
+        Return hashes of a file computed ahead of time, either in a previous run
+        and stored in the local hash index, or in a worker process. Hashes
+        added to the returned entry are saved in the local hash index.
+        """
+        try:
+            filesystem_path = local_storage.path(path)
+        except NotImplementedError:
+            return {}
+        hashes = self.get_indexed_hashes(filesystem_path)
+        pending = self.pending_hashes.pop((path, local_storage), None)
+        if pending is None:
+            return hashes
+        future, i = pending
+        try:
+            computed = future.result()[i]
+        except Exception:
+            logger.debug("Error hashing file in worker process", exc_info=True)
+            return hashes
+        # Only trust the result if the file hasn't changed since it was hashed.
+        if "stat" not in hashes or computed["stat"] == hashes["stat"]:
+            hashes.update(computed)
+        size = computed["stat"][0]
+        self.stats.add_bytes("hashed", size * 2 if "gzip" in computed else size)
+        return hashes
+
+    def get_plan_hash(
+        self, path: str, prefixed_path: str, local_storage: Storage
+    ) -> Optional[str]:
+        if self.is_immutable(prefixed_path):
+            return None
+        return self.get_local_file_hash(path, local_storage)
 
     @lru_cache(maxsize=None)
     def get_local_file_hash(self, path: str, local_storage: Storage) -> str:
         """Create md5 hash from file contents."""
-        # Read file contents and handle file closing
-        file = local_storage.open(path)
-        try:
-            contents = file.read()
-        finally:
-            file.close()
-
-        file_hash = hashlib.md5(contents).hexdigest()
+        with self.stats.measure("local_hash"):
+            return self._get_local_file_hash(path, local_storage)
+
+    def _get_local_file_hash(self, path: str, local_storage: Storage) -> str:
+        hashes = self.get_stored_hashes(path, local_storage)
+        gzipped = self.should_gzip(path)
+        if "md5" not in hashes:
+            hashes.update(
+                self.hash_local_file(
+                    path, local_storage, gzipped and "gzip" not in hashes
+                )
+            )
+        file_hash: str = hashes["md5"]
 
         # Check if content should be gzipped and hash gzipped content
-        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
-        if self.use_gzip and content_type in settings.gzip_content_types:
-            file_hash = self.get_gzipped_local_file_hash(file_hash, path, contents)
+        if gzipped:
+            if "gzip" not in hashes:
+                hashes["gzip"] = self.get_gzipped_local_file_hash(
+                    file_hash, path, local_storage
+                )
+            file_hash = hashes["gzip"]
 
         return file_hash
 
+    def hash_local_file(
+        self, path: str, local_storage: Storage, gzipped: bool
+    ) -> Entry:
+        """
+        Hash the contents of a file and, if gzipped is true, its gzipped contents
+        in a single pass, like hash_file() does in worker processes.
+        """
+        hash_ = self.hash_factory()
+        if not gzipped:
+            size = self.read_file(path, local_storage, hash_.update)
+            self.stats.add_bytes("hashed", size)
+            return {"md5": hash_.hexdigest()}
+
+        gzip_hash = self.hash_factory()
+        spool = self.create_spool()
+        with open_gzip_writer(gzip_hash, spool) as zf:
+
+            def write(chunk: bytes) -> None:
+                hash_.update(chunk)
+                zf.write(chunk)
+
+            size = self.read_file(path, local_storage, write)
+        self.stats.add_bytes("hashed", size * 2)
+        self.keep_compressed_spool(path, local_storage, spool)
+        return {"md5": hash_.hexdigest(), "gzip": gzip_hash.hexdigest()}
+
+    def copy_file(self, path: str, prefixed_path: str, local_storage: Storage) -> bool:
+        """
+        With COLLECTFAST_SERVER_SIDE_COPY, upload each content once per run and
+        copy it within the remote storage to the paths of identical files.
+        Contents are identified by their hash and content type, since the
+        content type decides the metadata and encoding of uploaded files.
+        """
+        key = self.get_copy_key(path, prefixed_path, local_storage)
+        if key is None:
+            return super().copy_file(path, prefixed_path, local_storage)
+        with self._uploads_lock:
+            upload = self._uploads.get(key)
+            if upload is None:
+                self._uploads[key] = Future()
+        if upload is None:
+            return self.upload_content(key, path, prefixed_path, local_storage)
+        try:
+            source_path = upload.result()
+        except Exception:
+            return super().copy_file(path, prefixed_path, local_storage)
+        logger.debug(
+            "Copying remote file", extra={"source": source_path, "path": prefixed_path}
+        )
+        self.remote_call(
+            "copy", partial(self.copy_remote_file, source_path, prefixed_path)
+        )
+        self.stats.add_count("copied remotely")
+        return True
+
+    def upload_content(
+        self,
+        key: Tuple[str, Optional[str]],
+        path: str,
+        prefixed_path: str,
+        local_storage: Storage,
+    ) -> bool:
+        upload = self._uploads[key]
+        try:
+            copied = super().copy_file(path, prefixed_path, local_storage)
+        except BaseException as error:
+            upload.set_exception(error)
+            raise
+        # When the upload was unnecessary the remote file has the contents too.
+        upload.set_result(prefixed_path)
+        return copied
+
+    def get_copy_key(
+        self, path: str, prefixed_path: str, local_storage: Storage
+    ) -> Optional[Tuple[str, Optional[str]]]:
+        if not settings.server_side_copy or not self.can_copy_remote_file(
+            path, local_storage
+        ):
+            return None
+        content_type = mimetypes.guess_type(prefixed_path)[0]
+        return self.get_local_file_hash(path, local_storage), content_type
+
+    def can_copy_remote_file(self, path: str, local_storage: Storage) -> bool:
+        """Return True if copy_remote_file() can create a copy of the file."""
+        return False
+
+    def copy_remote_file(self, source_prefixed_path: str, prefixed_path: str) -> None:
+        """Copy a remote file within the remote storage."""
+        raise NotImplementedError
+
     @abc.abstractmethod
     def get_remote_file_hash(self, prefixed_path: str) -> Optional[str]:
         ...
 
+    def get_remote_file_size(self, prefixed_path: str) -> Optional[int]:
+        """
+        Return the size of the remote file if it's known without making any
+        additional requests, e.g. because it was included in the response of a
+        previous remote hash lookup.
+        """
+        return None
+
+    def post_collect_hook(self) -> None:
+        """
+        Persist the local hash index and the remote manifest, release gzipped
+        contents that weren't uploaded, and shut down worker processes.
+        """
+        super().post_collect_hook()
+        with self._compressed_lock:
+            spools, self._compressed = list(self._compressed.values()), {}
+        for spool in spools:
+            spool.close()
+        if self.remote_manifest is not None and self.write_shared_state:
+            self.remote_manifest.save()
+        if self.local_hash_index is not None:
+            self.local_hash_index.save()
+        if self.hash_pool is not None:
+            self.hash_pool.shutdown()
+            self.hash_pool = None
+
 
 class CachingHashStrategy(HashStrategy[_RemoteStorage], abc.ABC):
+    def __init__(self, remote_storage: _RemoteStorage) -> None:
+        super().__init__(remote_storage)
+        # When COLLECTFAST_CACHE_BATCH_SIZE is set, values are prefetched for
+        # discovered files and writes are buffered until a batch is full.
+        self.cache_lock = threading.Lock()
+        self.prefetched_values: Dict[str, Any] = {}
+        self.pending_sets: Dict[str, Any] = {}
+        self.pending_deletes: Set[str] = set()
+
     @lru_cache(maxsize=None)
     def get_cache_key(self, path: str) -> str:
         path_hash = hashlib.md5(path.encode()).hexdigest()
         return settings.cache_key_prefix + path_hash
 
-    def invalidate_cached_hash(self, path: str) -> None:
-        cache.delete(self.get_cache_key(path))
+    def cache_get(self, key: str) -> Any:
+        """Get a value from the cache, returning False if it's missing."""
+        with self.cache_lock:
+            if key in self.pending_deletes:
+                return False
+            if key in self.pending_sets:
+                return self.pending_sets[key]
+            if key in self.prefetched_values:
+                return self.prefetched_values[key]
+        with self.stats.measure("cache"):
+            return cache.get(key, False)
+
+    def cache_set(self, key: str, value: Any) -> None:
+        if not settings.cache_batch_size:
+            with self.stats.measure("cache"):
+                cache.set(key, value)
+            return
+        with self.cache_lock:
+            self.pending_deletes.discard(key)
+            self.pending_sets[key] = value
+        if len(self.pending_sets) >= settings.cache_batch_size:
+            self.flush_cache()
+
+    def cache_delete(self, key: str) -> None:
+        if not settings.cache_batch_size:
+            with self.stats.measure("cache"):
+                cache.delete(key)
+            return
+        with self.cache_lock:
+            self.pending_sets.pop(key, None)
+            self.prefetched_values.pop(key, None)
+            self.pending_deletes.add(key)
+        if len(self.pending_deletes) >= settings.cache_batch_size:
+            self.flush_cache()
+
+    def flush_cache(self) -> None:
+        """Write buffered cache updates with one request per kind."""
+        with self.cache_lock:
+            sets, self.pending_sets = self.pending_sets, {}
+            deletes, self.pending_deletes = self.pending_deletes, set()
+            for key in sets:
+                self.prefetched_values.pop(key, None)
+        with self.stats.measure("cache"):
+            if sets:
+                cache.set_many(sets)
+            if deletes:
+                cache.delete_many(deletes)
+
+    def on_discover_hook(self, files: Sequence[Tuple[str, str, Storage]]) -> None:
+        """Prefetch cached remote hashes of discovered files in batches."""
+        super().on_discover_hook(files)
+        batch_size = settings.cache_batch_size
+        if not batch_size:
+            return
+        keys = [self.get_cache_key(prefixed_path) for _, prefixed_path, _ in files]
+        for batch in batched(keys, batch_size):
+            with self.stats.measure("cache"):
+                values = cache.get_many(batch)
+            with self.cache_lock:
+                for key in batch:
+                    self.prefetched_values[key] = values.get(key, False)
+
+    def invalidate_cached_hash(self, prefixed_path: str) -> None:
+        self.cache_delete(self.get_cache_key(prefixed_path))
+
+    def forget_remote_files(self, prefixed_paths: Sequence[str]) -> None:
+        """Invalidate cached hashes of deleted files."""
+        super().forget_remote_files(prefixed_paths)
+        for prefixed_path in prefixed_paths:
+            self.invalidate_cached_hash(prefixed_path)
 
     def should_copy_file(
         self, path: str, prefixed_path: str, local_storage: Storage
     ) -> bool:
-        local_hash = self.get_local_file_hash(path, local_storage)
-        remote_hash = self.get_cached_remote_file_hash(path, prefixed_path)
-        if local_hash != remote_hash:
+        if self.is_immutable(prefixed_path):
+            stale = not self.remote_file_exists(path, prefixed_path)
+        else:
+            stale = self.is_stale(
+                path,
+                prefixed_path,
+                local_storage,
+                partial(self.get_cached_remote_file_hash, path),
+            )
+        if stale:
             # invalidate cached hash, since we expect its corresponding file to
             # be overwritten
-            self.invalidate_cached_hash(path)
+            self.invalidate_cached_hash(prefixed_path)
             return True
         return False
 
     def get_cached_remote_file_hash(self, path: str, prefixed_path: str) -> str:
-        """Cache the hash of the remote storage file."""
-        cache_key = self.get_cache_key(path)
-        hash_ = cache.get(cache_key, False)
+        """
+        Cache the hash of the remote storage file. Hashes are cached by prefixed
+        path, the name of the file in the remote storage.
+        """
+        cache_key = self.get_cache_key(prefixed_path)
+        hash_ = self.cache_get(cache_key)
         if hash_ is False:
-            hash_ = self.get_remote_file_hash(prefixed_path)
-            cache.set(cache_key, hash_)
+            with self.stats.measure("remote_hash"):
+                hash_ = self.fetch_remote_file_hash(prefixed_path)
+            self.cache_set(cache_key, hash_)
         return str(hash_)
 
+    def remote_file_exists(self, path: str, prefixed_path: str) -> bool:
+        """Look up existence in the cache, which holds None for missing files."""
+        return self.get_cached_remote_file_hash(path, prefixed_path) != str(None)
+
     def get_gzipped_local_file_hash(
-        self, uncompressed_file_hash: str, path: str, contents: str
+        self, uncompressed_file_hash: str, path: str, local_storage: Storage
     ) -> str:
         """Cache the hash of the gzipped local file."""
         cache_key = self.get_cache_key("gzip_hash_%s" % uncompressed_file_hash)
-        file_hash = cache.get(cache_key, False)
+        file_hash = self.cache_get(cache_key)
         if file_hash is False:
             file_hash = super().get_gzipped_local_file_hash(
-                uncompressed_file_hash, path, contents
+                uncompressed_file_hash, path, local_storage
             )
-            cache.set(cache_key, file_hash)
+            self.cache_set(cache_key, file_hash)
         return str(file_hash)
 
     def post_copy_hook(
         self, path: str, prefixed_path: str, local_storage: Storage
     ) -> None:
-        """Cache the hash of the just copied local file."""
+        """
+        Cache the hash of the just copied local file. Immutable files aren't
+        hashed and are cached with an empty hash, which only tells that they
+        exist.
+        """
         super().post_copy_hook(path, prefixed_path, local_storage)
-        key = self.get_cache_key(path)
-        value = self.get_local_file_hash(path, local_storage)
-        cache.set(key, value)
+        value = ""
+        if not self.is_immutable(prefixed_path):
+            value = self.get_local_file_hash(path, local_storage)
+        self.cache_set(self.get_cache_key(prefixed_path), value)
+
+    def post_collect_hook(self) -> None:
+        """Flush buffered cache updates."""
+        super().post_collect_hook()
+        self.flush_cache()
 
 
 class DisabledStrategy(Strategy):
@@ -1,26 +1,157 @@
+import gzip
+import hashlib
+import io
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import IO
+from typing import Any
+from typing import Dict
+from typing import List
 from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
+from typing import cast
 
 import botocore.exceptions
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from django.core.files.storage import Storage
 from storages.backends.s3boto3 import S3Boto3Storage
-from storages.utils import safe_join
+from storages.utils import clean_name
 
 from collectfast import settings
 
 from .base import CachingHashStrategy
+from .base import batched
 
 logger = logging.getLogger(__name__)
 
+# Error codes and HTTP statuses of requests S3 throttled.
+THROTTLING_CODES = frozenset(
+    ("SlowDown", "Throttling", "ThrottlingException", "RequestLimitExceeded", "503")
+)
+THROTTLING_STATUSES = frozenset((429, 503))
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    """Compress data the same way as S3Boto3Storage does before uploading."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(mode="wb", fileobj=buffer, mtime=0.0) as zf:
+        zf.write(data)
+    return buffer.getvalue()
+
+
+class MultipartETag:
+    """
+    Hash object computing the ETag S3 assigns to uploaded contents. Objects
+    uploaded in a single request get the md5 of their contents as ETag, while
+    objects uploaded in parts get the md5 of the concatenated md5 digests of
+    each part, suffixed with the number of parts.
+    """
+
+    def __init__(self, threshold: int, chunksize: int) -> None:
+        self.threshold = threshold
+        self.chunksize = chunksize
+        self.size = 0
+        self.md5 = hashlib.md5()
+        self.part = hashlib.md5()
+        self.part_size = 0
+        self.part_digests: List[bytes] = []
+
+    def update(self, data: bytes) -> None:
+        # The md5 of the whole contents is only needed if the object ends up
+        # being uploaded in a single request.
+        if self.size < self.threshold:
+            self.md5.update(data)
+        self.size += len(data)
+        view = memoryview(data)
+        while view:
+            length = min(len(view), self.chunksize - self.part_size)
+            self.part.update(view[:length])
+            self.part_size += length
+            view = view[length:]
+            if self.part_size == self.chunksize:
+                self.part_digests.append(self.part.digest())
+                self.part = hashlib.md5()
+                self.part_size = 0
+
+    def hexdigest(self) -> str:
+        if self.size < self.threshold:
+            return self.md5.hexdigest()
+        digests = self.part_digests[:]
+        if self.part_size:
+            digests.append(self.part.digest())
+        return "%s-%d" % (hashlib.md5(b"".join(digests)).hexdigest(), len(digests))
+
 
 class Boto3Strategy(CachingHashStrategy[S3Boto3Storage]):
+    # Maximum number of keys accepted by a DeleteObjects request.
+    delete_batch_size = 1000
+    keep_compressed = True
+
     def __init__(self, remote_storage: S3Boto3Storage) -> None:
+        transfer_config = getattr(remote_storage, "transfer_config", None)
+        transfer_config = transfer_config or TransferConfig()
+        # Large files are uploaded in parts by S3Boto3Storage, so their ETag
+        # isn't a plain md5 hash of the contents. The hash factory is set up
+        # first since the local hash index is keyed by it.
+        self.multipart_threshold = transfer_config.multipart_threshold
+        self.multipart_chunksize = (
+            settings.aws_multipart_chunksize or transfer_config.multipart_chunksize
+        )
+        self.hash_factory = partial(
+            MultipartETag, self.multipart_threshold, self.multipart_chunksize
+        )
         super().__init__(remote_storage)
         self.remote_storage.preload_metadata = True
         self.use_gzip = settings.aws_is_gzipped
+        self._remote_hashes: Optional[Dict[str, Optional[str]]] = None
+        self._remote_hashes_lock = threading.Lock()
+        self._remote_sizes: Dict[str, int] = {}
+        self._local = threading.local()
+        # Paths for which the remote check is left to a conditional write.
+        self._conditional_paths: Set[str] = set()
+        if settings.threads:
+            self._size_connection_pool(settings.threads)
+
+    def get_hash_identity(self) -> str:
+        """ETags of files uploaded in parts depend on the part sizes."""
+        return (
+            f"{super().get_hash_identity()}:"
+            f"{self.multipart_threshold}:{self.multipart_chunksize}"
+        )
+
+    def _size_connection_pool(self, size: int) -> None:
+        """
+        Let the storage's connection pool hold a connection for each thread, so
+        that connections are reused rather than discarded when the pool is full.
+        """
+        client_config = getattr(self.remote_storage, "client_config", None)
+        client_config = client_config or Config()
+        if client_config.max_pool_connections < size:
+            client_config = client_config.merge(Config(max_pool_connections=size))
+        self.remote_storage.client_config = client_config
+
+    def _create_bucket(self) -> Any:
+        return self.remote_storage.connection.Bucket(self.remote_storage.bucket_name)
+
+    @property
+    def bucket(self) -> Any:
+        """
+        Bucket resource of the current thread. boto3 resources aren't thread
+        safe, so each thread creates its own once and reuses it for all files.
+        """
+        bucket = getattr(self._local, "bucket", None)
+        if bucket is None:
+            bucket = self._local.bucket = self._create_bucket()
+        return bucket
 
     def _normalize_path(self, prefixed_path: str) -> str:
-        path = str(safe_join(self.remote_storage.location, prefixed_path))
-        return path.replace("\\", "")
+        """Return the key S3Boto3Storage writes the file to."""
+        return str(self.remote_storage._normalize_name(clean_name(prefixed_path)))
 
     @staticmethod
     def _clean_hash(quoted_hash: Optional[str]) -> Optional[str]:
@@ -30,17 +161,216 @@ class Boto3Strategy(CachingHashStrategy[S3Boto3Storage]):
         assert quoted_hash[0] == quoted_hash[-1] == '"'
         return quoted_hash[1:-1]
 
+    def _get_preloaded_hashes(self) -> Dict[str, Optional[str]]:
+        """
+        List the storage location once and index the ETags of all objects by
+        key. The listing is deferred until the first remote lookup so that
+        runs answered entirely from the cache never make the request.
+        """
+        with self._remote_hashes_lock:
+            if self._remote_hashes is None:
+                prefix = self._normalize_path("")
+                logger.debug("Preloading remote hashes", extra={"prefix": prefix})
+                objects = self.bucket.objects.filter(Prefix=prefix)
+                self._remote_hashes = {}
+                for summary in objects:
+                    self._remote_hashes[summary.key] = self._clean_hash(summary.e_tag)
+                    self._remote_sizes[summary.key] = summary.size
+        return self._remote_hashes
+
+    def is_throttling_error(self, error: Exception) -> bool:
+        if not isinstance(error, botocore.exceptions.ClientError):
+            return False
+        code = error.response.get("Error", {}).get("Code")
+        status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        return code in THROTTLING_CODES or status in THROTTLING_STATUSES
+
     def get_remote_file_hash(self, prefixed_path: str) -> Optional[str]:
+        """
+        Return the ETag of the object. Throttled requests raise ThrottledError
+        once retries are exhausted rather than being taken for missing objects.
+        """
         normalized_path = self._normalize_path(prefixed_path)
+        if settings.preload_remote_hashes:
+            return self._get_preloaded_hashes().get(normalized_path)
         logger.debug("Getting file hash", extra={"normalized_path": normalized_path})
+        obj = self.bucket.Object(normalized_path)
         try:
-            hash_: str = self.remote_storage.bucket.Object(normalized_path).e_tag
+            self.remote_call("head", obj.load)
         except botocore.exceptions.ClientError:
             logger.debug("Error on remote hash request", exc_info=True)
             return None
+        hash_: str = obj.e_tag
+        self._remote_sizes[normalized_path] = obj.content_length
         return self._clean_hash(hash_)
 
-    def pre_should_copy_hook(self) -> None:
-        if settings.threads:
-            logger.info("Resetting connection")
-            self.remote_storage._connection = None
+    def get_remote_file_size(self, prefixed_path: str) -> Optional[int]:
+        return self._remote_sizes.get(self._normalize_path(prefixed_path))
+
+    def delete_files(self, prefixed_paths: Sequence[str]) -> None:
+        """
+        Delete objects with concurrent DeleteObjects requests. Keys are built
+        like S3Boto3Storage.delete() does, since objects missing from the
+        requests aren't reported.
+        """
+        keys = [self._normalize_path(prefixed_path) for prefixed_path in prefixed_paths]
+        with ThreadPoolExecutor(settings.threads or 1) as pool:
+            # Consume results to propagate exceptions.
+            list(pool.map(self._delete_objects, batched(keys, self.delete_batch_size)))
+        self.forget_remote_files(prefixed_paths)
+
+    def _delete_objects(self, keys: Sequence[str]) -> None:
+        logger.debug("Deleting objects", extra={"count": len(keys)})
+        delete = {"Objects": [{"Key": key} for key in keys], "Quiet": True}
+        response = self.remote_call(
+            "delete", partial(self.bucket.delete_objects, Delete=delete)
+        )
+        errors = response.get("Errors", ())
+        if errors:
+            raise OSError(
+                "Failed to delete %d objects, first error for %r: %s"
+                % (len(errors), errors[0]["Key"], errors[0]["Message"])
+            )
+
+    def can_write_conditionally(
+        self, path: str, prefixed_path: str, local_storage: Storage
+    ) -> bool:
+        """
+        Conditional writes replace remote existence checks of files with
+        content-hashed names when enabled, since an existing object is then
+        known to be up to date. Other files are still compared by hash. Hashes
+        that are preloaded or read from the remote manifest make the checks
+        free anyway, and planned decisions can't be deferred. Files above the
+        multipart threshold are uploaded in parts, which can't be done
+        conditionally.
+        """
+        return (
+            self.defer_checks
+            and settings.aws_conditional_writes
+            and self.is_immutable(prefixed_path)
+            and not settings.preload_remote_hashes
+            and not settings.remote_manifest
+            and local_storage.size(path) < self.multipart_threshold
+        )
+
+    def should_copy_file(
+        self, path: str, prefixed_path: str, local_storage: Storage
+    ) -> bool:
+        """
+        When the remote hash isn't cached, leave the decision to a conditional
+        write in copy_file() instead of requesting the hash.
+        """
+        if (
+            self.can_write_conditionally(path, prefixed_path, local_storage)
+            and self.cache_get(self.get_cache_key(prefixed_path)) is False
+        ):
+            self._conditional_paths.add(prefixed_path)
+            return True
+        return super().should_copy_file(path, prefixed_path, local_storage)
+
+    def copy_file(self, path: str, prefixed_path: str, local_storage: Storage) -> bool:
+        """
+        Create the object only if it doesn't exist yet. If it does, the file is
+        up to date since its name is derived from its contents, and its
+        existence is cached like post_copy_hook() does for uploaded files.
+        """
+        if prefixed_path not in self._conditional_paths:
+            return super().copy_file(path, prefixed_path, local_storage)
+        self._conditional_paths.discard(prefixed_path)
+        try:
+            self._put_if_absent(path, prefixed_path, local_storage)
+        except botocore.exceptions.ClientError as error:
+            if error.response["Error"]["Code"] not in ("PreconditionFailed", "412"):
+                raise
+            logger.debug("Object exists", extra={"prefixed_path": prefixed_path})
+            self.cache_set(self.get_cache_key(prefixed_path), "")
+            return False
+        return True
+
+    def _get_write_parameters(self, name: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Return the parameters S3Boto3Storage writes an object with, and whether
+        it gzips the contents.
+        """
+        storage = self.remote_storage
+        params = storage._get_write_parameters(name)
+        gzipped = (
+            storage.gzip
+            and params["ContentType"] in storage.gzip_content_types
+            and "ContentEncoding" not in params
+        )
+        if gzipped:
+            params["ContentEncoding"] = "gzip"
+        return params, gzipped
+
+    def can_copy_remote_file(self, path: str, local_storage: Storage) -> bool:
+        """
+        Copies get the md5 of their contents as ETag, so files uploaded in
+        parts aren't copied to keep their ETags comparable with local hashes.
+        """
+        return local_storage.size(path) < self.multipart_threshold
+
+    def copy_remote_file(self, source_prefixed_path: str, prefixed_path: str) -> None:
+        name = self._normalize_path(prefixed_path)
+        params, _gzipped = self._get_write_parameters(name)
+        copy_source = {
+            "Bucket": self.remote_storage.bucket_name,
+            "Key": self._normalize_path(source_prefixed_path),
+        }
+        self.bucket.Object(name).copy_from(
+            CopySource=copy_source, MetadataDirective="REPLACE", **params
+        )
+
+    def save_file(self, path: str, prefixed_path: str, local_storage: Storage) -> None:
+        """
+        Upload the file with the bucket resource of the current thread, like
+        S3Boto3Storage._save() does with the single resource it shares between
+        all threads. The gzipped contents kept from hashing the file are
+        uploaded if there are any, rather than compressing the file again.
+        """
+        name = self._normalize_path(prefixed_path)
+        params, gzipped = self._get_write_parameters(name)
+        upload_file = self.pop_compressed(path, local_storage) if gzipped else None
+        if upload_file is None:
+            upload_file = self._open_for_upload(path, local_storage, gzipped)
+        obj = self.bucket.Object(name)
+        with upload_file as file:
+            file.seek(0, io.SEEK_END)
+            size = file.tell()
+
+            def upload() -> None:
+                file.seek(0)
+                obj.upload_fileobj(
+                    file,
+                    ExtraArgs=params,
+                    Config=self.remote_storage.transfer_config,
+                )
+
+            self.remote_call("save", upload)
+        self.stats.add_bytes("uploaded", size)
+
+    @staticmethod
+    def _open_for_upload(path: str, local_storage: Storage, gzipped: bool) -> IO[bytes]:
+        file = cast(IO[bytes], local_storage.open(path))
+        if not gzipped:
+            return file
+        with file:
+            return io.BytesIO(gzip_bytes(file.read()))
+
+    def _put_if_absent(
+        self, path: str, prefixed_path: str, local_storage: Storage
+    ) -> None:
+        name = self._normalize_path(prefixed_path)
+        params, gzipped = self._get_write_parameters(name)
+        compressed = self.pop_compressed(path, local_storage)
+        if gzipped and compressed is not None:
+            with compressed:
+                body = compressed.read()
+        else:
+            with local_storage.open(path) as file:
+                body = file.read()
+            if gzipped:
+                body = gzip_bytes(body)
+        obj = self.bucket.Object(name)
+        self.remote_call("put", partial(obj.put, Body=body, IfNoneMatch="*", **params))
+        self.stats.add_bytes("uploaded", len(body))
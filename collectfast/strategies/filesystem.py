@@ -1,18 +1,50 @@
+import os
+import shutil
 from typing import Optional
 
 from django.core.files.storage import FileSystemStorage
+from django.core.files.storage import Storage
 
 from .base import CachingHashStrategy
 from .base import HashStrategy
 
 
 class FileSystemStrategy(HashStrategy[FileSystemStorage]):
+    remote_size_from_lookup = False
+
     def get_remote_file_hash(self, prefixed_path: str) -> Optional[str]:
         try:
             return self.get_local_file_hash(prefixed_path, self.remote_storage)
         except FileNotFoundError:
             return None
 
+    def remote_file_exists(self, path: str, prefixed_path: str) -> bool:
+        return self.remote_storage.exists(prefixed_path)
+
+    def get_remote_file_size(self, prefixed_path: str) -> Optional[int]:
+        try:
+            return self.remote_storage.size(prefixed_path)
+        except FileNotFoundError:
+            return None
+
+    def can_copy_remote_file(self, path: str, local_storage: Storage) -> bool:
+        return True
+
+    def copy_remote_file(self, source_prefixed_path: str, prefixed_path: str) -> None:
+        """Hardlink the file, or copy it if the file system can't link it."""
+        source = self.remote_storage.path(source_prefixed_path)
+        target = self.remote_storage.path(prefixed_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.lexists(target):
+            os.remove(target)
+        try:
+            os.link(source, target)
+        except OSError:
+            shutil.copyfile(source, target)
+            mode = self.remote_storage.file_permissions_mode
+            if mode is not None:
+                os.chmod(target, mode)
+
 
 class CachingFileSystemStrategy(
     CachingHashStrategy[FileSystemStorage], FileSystemStrategy
@@ -1,20 +1,126 @@
 import base64
 import binascii
+import logging
+import threading
+from functools import partial
+from typing import Dict
 from typing import Optional
+from typing import Sequence
 
+from django.core.files.storage import Storage
+from google.api_core.exceptions import GoogleAPICallError
 from google.api_core.exceptions import NotFound
+from google.api_core.exceptions import ServiceUnavailable
+from google.api_core.exceptions import TooManyRequests
+from google.cloud.storage import Blob
 from storages.backends.gcloud import GoogleCloudStorage
+from storages.utils import clean_name
+
+from collectfast import settings
 
 from .base import CachingHashStrategy
+from .base import batched
+
+logger = logging.getLogger(__name__)
 
 
 class GoogleCloudStrategy(CachingHashStrategy[GoogleCloudStorage]):
     delete_not_found_exception = (NotFound,)
+    # Maximum number of calls accepted in a batch request.
+    delete_batch_size = 100
+
+    def __init__(self, remote_storage: GoogleCloudStorage) -> None:
+        super().__init__(remote_storage)
+        self._remote_hashes: Optional[Dict[str, Optional[str]]] = None
+        self._remote_hashes_lock = threading.Lock()
+        self._remote_sizes: Dict[str, int] = {}
+
+    def _normalize_path(self, prefixed_path: str) -> str:
+        """Return the name GoogleCloudStorage writes the file to."""
+        return str(self.remote_storage._normalize_name(clean_name(prefixed_path)))
+
+    @staticmethod
+    def _get_blob_hash(blob: Blob) -> Optional[str]:
+        # Composite objects don't have an md5 hash, they will always be copied.
+        md5_base64 = blob._properties.get("md5Hash")
+        if md5_base64 is None:
+            return None
+        return binascii.hexlify(base64.urlsafe_b64decode(md5_base64)).decode()
+
+    def _get_preloaded_hashes(self) -> Dict[str, Optional[str]]:
+        """
+        Page through all blobs under the storage location once, fetching only
+        the fields needed for comparison, and index their hashes by name. The
+        listing is deferred until the first remote lookup so that runs answered
+        entirely from the cache never make the request.
+        """
+        with self._remote_hashes_lock:
+            if self._remote_hashes is None:
+                prefix = self._normalize_path("")
+                logger.debug("Preloading remote hashes", extra={"prefix": prefix})
+                blobs = self.remote_storage.bucket.list_blobs(
+                    prefix=prefix,
+                    fields="items(name,md5Hash,crc32c,size),nextPageToken",
+                )
+                self._remote_hashes = {}
+                for blob in blobs:
+                    self._remote_hashes[blob.name] = self._get_blob_hash(blob)
+                    self._remote_sizes[blob.name] = blob.size
+        return self._remote_hashes
+
+    def is_throttling_error(self, error: Exception) -> bool:
+        return isinstance(error, (TooManyRequests, ServiceUnavailable))
 
     def get_remote_file_hash(self, prefixed_path: str) -> Optional[str]:
-        normalized_path = prefixed_path.replace("\\", "/")
-        blob = self.remote_storage.bucket.get_blob(normalized_path)
+        normalized_path = self._normalize_path(prefixed_path)
+        if settings.preload_remote_hashes:
+            return self._get_preloaded_hashes().get(normalized_path)
+        bucket = self.remote_storage.bucket
+        blob = self.remote_call("head", partial(bucket.get_blob, normalized_path))
         if blob is None:
             return blob
-        md5_base64 = blob._properties["md5Hash"]
-        return binascii.hexlify(base64.urlsafe_b64decode(md5_base64)).decode()
+        self._remote_sizes[normalized_path] = blob.size
+        return self._get_blob_hash(blob)
+
+    def get_remote_file_size(self, prefixed_path: str) -> Optional[int]:
+        return self._remote_sizes.get(self._normalize_path(prefixed_path))
+
+    def can_copy_remote_file(self, path: str, local_storage: Storage) -> bool:
+        return True
+
+    def copy_remote_file(self, source_prefixed_path: str, prefixed_path: str) -> None:
+        bucket = self.remote_storage.bucket
+        source = bucket.blob(self._normalize_path(source_prefixed_path))
+        bucket.copy_blob(source, bucket, self._normalize_path(prefixed_path))
+
+    def delete_files(self, prefixed_paths: Sequence[str]) -> None:
+        """
+        Delete blobs using batch requests. Batches are sent one at a time since
+        the client doesn't support concurrent batches. A failed batch only
+        raises the error of one of its calls, so its blobs are then deleted one
+        at a time to ignore missing blobs and raise any other error.
+        """
+        names = [
+            self._normalize_path(prefixed_path) for prefixed_path in prefixed_paths
+        ]
+        for batch in batched(names, self.delete_batch_size):
+            logger.debug("Deleting blobs", extra={"count": len(batch)})
+            try:
+                self.remote_call("delete", partial(self._delete_batch, batch))
+            except GoogleAPICallError:
+                logger.debug("Error in batch delete", exc_info=True)
+                for name in batch:
+                    self._delete_blob(name)
+        self.forget_remote_files(prefixed_paths)
+
+    def _delete_batch(self, names: Sequence[str]) -> None:
+        with self.remote_storage.client.batch():
+            for name in names:
+                self.remote_storage.bucket.delete_blob(name)
+
+    def _delete_blob(self, name: str) -> None:
+        bucket = self.remote_storage.bucket
+        try:
+            self.remote_call("delete", partial(bucket.delete_blob, name))
+        except NotFound:
+            pass
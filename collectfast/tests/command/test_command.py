@@ -1,17 +1,35 @@
+import json
+import os
+import pathlib
+import tempfile
+import time
 from unittest import TestCase
 from unittest import mock
 
+from django.conf import settings as django_settings
 from django.core.exceptions import ImproperlyConfigured
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import CommandError
 from django.test import override_settings as override_django_settings
 
+from collectfast.autotune import get_remembered_threads
 from collectfast.management.commands.collectstatic import Command
+from collectfast.management.commands.collectstatic import PathList
+from collectfast.management.commands.collectstatic import Task
+from collectfast.plan import Plan
+from collectfast.sharding import marker_name
+from collectfast.sharding import named_run_key
+from collectfast.sharding import save_marker
+from collectfast.stats import format_bytes
 from collectfast.tests.utils import clean_static_dir
 from collectfast.tests.utils import create_static_file
 from collectfast.tests.utils import live_test
 from collectfast.tests.utils import make_test
 from collectfast.tests.utils import override_setting
 from collectfast.tests.utils import override_storage_attr
+from collectfast.tests.utils import static_dir
 from collectfast.tests.utils import test_many
+from collectfast.throttling import ThrottledError
 
 from .utils import call_collectstatic
 
@@ -118,3 +136,401 @@ def test_calls_on_skip_hook(_case: TestCase, on_skip_hook: mock.MagicMock) -> No
     on_skip_hook.assert_not_called()
     cmd.run_from_argv(["manage.py", "collectstatic", "--noinput"])
     on_skip_hook.assert_called_once_with(mock.ANY, path.name, path.name, mock.ANY)
+
+
+@make_test
+@override_setting("threads", 5)
+@override_setting("pipeline", True)
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_pipeline(case: TestCase) -> None:
+    clean_static_dir()
+    create_static_file()
+    create_static_file()
+    case.assertIn("2 static files copied.", call_collectstatic())
+    case.assertIn("0 static files copied.", call_collectstatic())
+
+
+@make_test
+@override_setting("threads", 2)
+@override_setting("pipeline", True)
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+@mock.patch.object(Command, "pipeline_batch_size", 2)
+@mock.patch("collectfast.strategies.base.Strategy.on_discover_hook", autospec=True)
+def test_calls_on_discover_hook_in_batches(
+    case: TestCase, on_discover_hook: mock.MagicMock
+) -> None:
+    clean_static_dir()
+    for _ in range(3):
+        create_static_file()
+    call_collectstatic()
+    case.assertEqual(
+        [2, 1], [len(call.args[1]) for call in on_discover_hook.call_args_list]
+    )
+
+
+@make_test
+@override_setting("threads", 3)
+@override_setting("pipeline", True)
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+@mock.patch.object(Command, "max_queued_tasks", 1)
+def test_bounds_queued_tasks(case: TestCase) -> None:
+    clean_static_dir()
+    for _ in range(4):
+        create_static_file()
+    running = []
+    most_running = 0
+    run_task = Command.run_task
+
+    def tracked_run_task(self: Command, args: Task) -> None:
+        nonlocal most_running
+        running.append(args)
+        most_running = max(most_running, len(running))
+        time.sleep(0.01)
+        run_task(self, args)
+        running.remove(args)
+
+    with mock.patch.object(Command, "run_task", tracked_run_task):
+        case.assertIn("4 static files copied.", call_collectstatic())
+    case.assertEqual(1, most_running)
+
+
+@make_test
+@override_setting("threads", 2)
+@override_setting("pipeline", True)
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+@mock.patch(
+    "collectfast.strategies.base.Strategy.save_file",
+    autospec=True,
+    side_effect=ThrottledError("save request throttled"),
+)
+def test_raises_errors_of_threaded_copies(
+    case: TestCase, save_file: mock.MagicMock
+) -> None:
+    clean_static_dir()
+    create_static_file()
+    create_static_file()
+    with case.assertRaises(ThrottledError):
+        call_collectstatic()
+    case.assertEqual(2, save_file.call_count)
+
+
+@make_test
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+@mock.patch("collectfast.strategies.base.Strategy.delete_files", autospec=True)
+def test_clear_deletes_files_in_one_call(
+    case: TestCase, delete_files: mock.MagicMock
+) -> None:
+    clean_static_dir()
+    create_static_file()
+    create_static_file()
+    call_collectstatic()
+    call_collectstatic(clear=True)
+    delete_files.assert_called_once()
+    case.assertEqual(2, len(delete_files.call_args.args[1]))
+
+
+@make_test
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY=(
+        "collectfast.strategies.filesystem.CachingFileSystemStrategy"
+    ),
+    STATICFILES_DIRS=[("vendor", str(static_dir))],
+)
+def test_clear_invalidates_cached_hashes_of_prefixed_files(case: TestCase) -> None:
+    clean_static_dir()
+    create_static_file()
+    case.assertIn("1 static file copied.", call_collectstatic())
+    case.assertIn("1 static file copied.", call_collectstatic(clear=True))
+
+
+@make_test
+@override_setting("threads", 2)
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_timing_report(case: TestCase) -> None:
+    clean_static_dir()
+    path = create_static_file()
+    with tempfile.TemporaryDirectory() as directory:
+        report_path = os.path.join(directory, "report.json")
+        result = call_collectstatic(timing_report=report_path)
+        with open(report_path) as f:
+            report = json.load(f)
+    case.assertIn("1 static file copied. Took ", result)
+    case.assertEqual({"collect", "find", "post_process"}, set(report["phases"].keys()))
+    case.assertEqual(1, report["latencies"]["copy"]["count"])
+    case.assertEqual(path.stat().st_size, report["bytes"]["uploaded"])
+
+
+@make_test
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+@mock.patch("collectfast.strategies.base.Strategy.on_skip_hook", autospec=True)
+@mock.patch(
+    "collectfast.strategies.base.Strategy.copy_file", autospec=True, return_value=False
+)
+def test_skips_file_when_strategy_copy_is_unnecessary(
+    case: TestCase, copy_file: mock.MagicMock, on_skip_hook: mock.MagicMock
+) -> None:
+    clean_static_dir()
+    path = create_static_file()
+    case.assertIn("0 static files copied.", call_collectstatic())
+    copy_file.assert_called_once_with(mock.ANY, path.name, path.name, mock.ANY)
+    on_skip_hook.assert_called_once_with(mock.ANY, path.name, path.name, mock.ANY)
+
+
+@make_test
+@override_setting("remote_manifest", ".collectfast-manifest.json")
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_remote_manifest_replaces_remote_lookups(case: TestCase) -> None:
+    clean_static_dir()
+    create_static_file()
+    create_static_file()
+    case.assertIn("2 static files copied.", call_collectstatic())
+    with mock.patch(
+        "collectfast.strategies.filesystem.FileSystemStrategy.get_remote_file_hash"
+    ) as get_remote_file_hash:
+        case.assertIn("0 static files copied.", call_collectstatic())
+        create_static_file()
+        case.assertIn("1 static file copied.", call_collectstatic())
+    get_remote_file_hash.assert_not_called()
+
+
+@make_test
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_plan_and_apply(case: TestCase) -> None:
+    clean_static_dir()
+    unchanged = create_static_file()
+    call_collectstatic()
+    new = create_static_file()
+    stale = pathlib.Path(django_settings.MEDIA_ROOT) / "stale.txt"
+    stale.write_text("stale")
+
+    with tempfile.TemporaryDirectory() as directory:
+        plan_path = os.path.join(directory, "plan.json")
+        result = call_collectstatic(plan=plan_path, clear=True)
+        case.assertIn("1 to upload (500 B), 1 to skip, 1 to delete", result)
+        case.assertTrue(stale.exists())
+        with open(plan_path) as f:
+            plan = json.load(f)
+        case.assertEqual([new.name], list(plan["upload"]))
+        case.assertEqual(32, len(plan["upload"][new.name]["hash"]))
+        case.assertEqual({unchanged.name: 500}, plan["skip"])
+        case.assertEqual(["stale.txt"], plan["delete"])
+
+        with mock.patch(
+            "collectfast.strategies.filesystem.FileSystemStrategy.should_copy_file"
+        ) as should_copy_file:
+            case.assertIn("1 static file copied.", call_collectstatic(apply=plan_path))
+        should_copy_file.assert_not_called()
+        case.assertFalse(stale.exists())
+        case.assertTrue((pathlib.Path(django_settings.MEDIA_ROOT) / new.name).exists())
+
+        new.write_text("changed")
+        with case.assertRaises(CommandError):
+            call_collectstatic(apply=plan_path)
+
+
+@make_test
+@override_setting("remote_manifest", ".collectfast-manifest.json")
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_plan_writes_nothing_to_remote_storage(case: TestCase) -> None:
+    clean_static_dir()
+    remote = pathlib.Path(django_settings.MEDIA_ROOT)
+    manifest = remote / ".collectfast-manifest.json"
+    if manifest.exists():
+        manifest.unlink()
+    new = create_static_file()
+
+    with tempfile.TemporaryDirectory() as directory:
+        plan_path = os.path.join(directory, "plan.json")
+        result = call_collectstatic(plan=plan_path)
+    case.assertIn("1 to upload", result)
+    case.assertFalse((remote / new.name).exists())
+    case.assertFalse(manifest.exists())
+
+
+@make_test
+@override_setting("remote_manifest", ".collectfast-manifest.json")
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_applied_skips_are_not_recorded_in_remote_manifest(case: TestCase) -> None:
+    clean_static_dir()
+    path = create_static_file()
+    call_collectstatic()
+    manifest = pathlib.Path(django_settings.MEDIA_ROOT) / ".collectfast-manifest.json"
+    manifest.unlink()
+
+    with tempfile.TemporaryDirectory() as directory:
+        plan_path = os.path.join(directory, "plan.json")
+        case.assertIn("1 to skip", call_collectstatic(plan=plan_path))
+        case.assertIn("0 static files copied.", call_collectstatic(apply=plan_path))
+    hashes = json.loads(manifest.read_text())["hashes"] if manifest.exists() else {}
+    case.assertNotIn(path.name, hashes)
+
+
+@make_test
+@override_setting("remote_manifest", ".collectfast-manifest.json")
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_applied_deletes_are_removed_from_remote_manifest(case: TestCase) -> None:
+    clean_static_dir()
+    path = create_static_file()
+    call_collectstatic()
+    contents = path.read_bytes()
+    path.unlink()
+
+    with tempfile.TemporaryDirectory() as directory:
+        plan_path = os.path.join(directory, "plan.json")
+        plan = Plan()
+        plan.delete = [path.name]
+        plan.save(plan_path)
+        call_collectstatic(apply=plan_path)
+
+    path.write_bytes(contents)
+    case.assertIn("1 static file copied.", call_collectstatic())
+
+
+@make_test
+@override_setting("remote_manifest", ".collectfast-manifest.json")
+@override_setting("incremental_post_process", True)
+@override_django_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.ManifestStaticFilesStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_shards(case: TestCase) -> None:
+    clean_static_dir()
+    paths = [create_static_file() for _ in range(4)]
+    result = call_collectstatic(shard="1/2")
+    case.assertIn("2 static files copied.", result)
+    case.assertNotIn("Post-processed", result)
+    remote = pathlib.Path(django_settings.STATIC_ROOT)
+    case.assertFalse((remote / "staticfiles.json").exists())
+
+    result = call_collectstatic(shard="0/2")
+    case.assertIn("2 static files copied.", result)
+    for path in paths:
+        case.assertTrue((remote / path.name).exists())
+        case.assertIn(f"Post-processed '{path.name}'", result)
+    case.assertEqual([], list((remote / ".collectfast-shards").rglob("*.json")))
+    with open(remote / ".collectfast-manifest.json") as f:
+        manifest = json.load(f)
+    case.assertTrue({path.name for path in paths} <= set(manifest["hashes"]))
+
+
+@make_test
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_shard_removes_own_stale_marker(case: TestCase) -> None:
+    clean_static_dir()
+    create_static_file()
+    storage = FileSystemStorage()
+    name = marker_name(named_run_key("build-1", 2), 1)
+    save_marker(storage, name, {"hashes": {}, "copied": []})
+
+    with mock.patch.object(Command, "mark_shard_done"):
+        call_collectstatic(shard="1/2", shard_run="build-1")
+    case.assertFalse(storage.exists(name))
+
+    with case.assertRaises(CommandError):
+        call_collectstatic(shard_run="build-1")
+
+
+@make_test
+@override_setting("shard_timeout", 0)
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_designated_shard_times_out_without_other_shards(case: TestCase) -> None:
+    clean_static_dir()
+    create_static_file()
+    create_static_file()
+    with mock.patch.object(Command, "shard_poll_interval", 0):
+        with case.assertRaises(CommandError):
+            call_collectstatic(shard="0/2")
+
+
+@make_test
+@override_setting("auto_threads", True)
+@override_setting("remember_threads", True)
+@override_setting("threads", 8)
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_auto_threads_remembers_best_value(case: TestCase) -> None:
+    clean_static_dir()
+    for _ in range(3):
+        create_static_file()
+    with mock.patch.object(Command, "auto_threads_initial", 2):
+        result = call_collectstatic()
+    case.assertIn("3 static files copied.", result)
+    case.assertIn("Best throughput with 2 concurrent requests", result)
+    case.assertEqual(2, get_remembered_threads(FileSystemStorage()))
+
+
+@make_test
+@override_setting("server_side_copy", True)
+@override_django_settings(
+    STATICFILES_STORAGE="django.core.files.storage.FileSystemStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_server_side_copy_of_identical_files(case: TestCase) -> None:
+    clean_static_dir()
+    original = create_static_file()
+    duplicate = original.with_name(f"duplicate-{original.name}")
+    duplicate.write_bytes(original.read_bytes())
+    other = create_static_file()
+
+    result = call_collectstatic()
+    case.assertIn("3 static files copied.", result)
+    case.assertIn("1 copied remotely", result)
+    uploaded = original.stat().st_size + other.stat().st_size
+    case.assertIn(f"{format_bytes(uploaded)} uploaded", result)
+    remote = pathlib.Path(django_settings.MEDIA_ROOT)
+    case.assertEqual(original.read_bytes(), (remote / duplicate.name).read_bytes())
+
+
+@make_test
+def test_path_list(case: TestCase) -> None:
+    paths = PathList()
+    paths.append("b.css")
+    paths.append("a.css")
+    case.assertIn("a.css", paths)
+    case.assertNotIn("c.css", paths)
+    case.assertEqual(["b.css", "a.css", "c.css"], paths + ["c.css"])
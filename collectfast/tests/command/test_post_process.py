@@ -1,12 +1,17 @@
+import shutil
 from unittest import mock
 
+from django.conf import settings as django_settings
 from django.contrib.staticfiles.storage import StaticFilesStorage
+from django.core.management import call_command
 from django.test import override_settings as override_django_settings
 
 from collectfast.management.commands.collectstatic import Command
+from collectfast.strategies.filesystem import FileSystemStrategy
 from collectfast.tests.utils import clean_static_dir
 from collectfast.tests.utils import create_static_file
 from collectfast.tests.utils import override_setting
+from collectfast.tests.utils import static_dir
 
 
 class MockPostProcessing(StaticFilesStorage):
@@ -17,7 +22,10 @@ class MockPostProcessing(StaticFilesStorage):
 
 @override_setting("threads", 2)
 @override_django_settings(
-    STATICFILES_STORAGE="collectfast.tests.command.test_post_process.MockPostProcessing"
+    STATICFILES_STORAGE=(
+        "collectfast.tests.command.test_post_process.MockPostProcessing"
+    ),
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
 )
 def test_calls_post_process_with_collected_files() -> None:
     clean_static_dir()
@@ -28,3 +36,57 @@ def test_calls_post_process_with_collected_files() -> None:
     cmd.storage.post_process.assert_called_once_with(
         {path.name: (mock.ANY, path.name)}, dry_run=False
     )
+
+
+@override_setting("incremental_post_process", True)
+@override_django_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.ManifestStaticFilesStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_incremental_post_process_only_processes_changed_files() -> None:
+    clean_static_dir()
+    shutil.rmtree(django_settings.STATIC_ROOT, ignore_errors=True)
+    image = create_static_file()
+    unrelated = create_static_file()
+    style = static_dir / "style.css"
+    style.write_text(f'body {{ background: url("{image.name}"); }}')
+
+    cmd = Command()
+    call_command(cmd, interactive=False, verbosity=0)
+    assert set(cmd.post_processed_files) == {image.name, unrelated.name, "style.css"}
+
+    image.write_text("changed")
+    cmd = Command()
+    call_command(cmd, interactive=False, verbosity=0)
+    assert set(cmd.post_processed_files) == {image.name, "style.css"}
+    hashed_files = cmd.storage.load_manifest()
+    assert set(hashed_files) == {image.name, unrelated.name, "style.css"}
+    assert (
+        hashed_files[image.name]
+        in cmd.storage.open(hashed_files["style.css"]).read().decode()
+    )
+
+    cmd = Command()
+    call_command(cmd, interactive=False, verbosity=0)
+    assert cmd.post_processed_files == []
+
+
+@override_setting("immutable_file_pattern", r"\.[0-9a-f]{8}\.")
+@override_django_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.ManifestStaticFilesStorage",
+    COLLECTFAST_STRATEGY="collectfast.strategies.filesystem.FileSystemStrategy",
+)
+def test_immutable_files_are_not_hashed_with_manifest_post_processing() -> None:
+    clean_static_dir()
+    shutil.rmtree(django_settings.STATIC_ROOT, ignore_errors=True)
+    vendor = static_dir / "vendor.3f2a9c1b.js"
+    vendor.write_text("vendor")
+    call_command(Command(), interactive=False, verbosity=0)
+
+    cmd = Command()
+    with mock.patch.object(FileSystemStrategy, "get_local_file_hash") as local_hash:
+        call_command(cmd, interactive=False, verbosity=0)
+    local_hash.assert_not_called()
+    assert cmd.num_copied_files == 0
+    hashed_name = cmd.storage.load_manifest()[vendor.name]
+    assert cmd.storage.exists(hashed_name)
@@ -0,0 +1,336 @@
+import hashlib
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from unittest import TestCase
+from unittest import mock
+
+import botocore.exceptions
+from django.core.files.storage import FileSystemStorage
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from collectfast.strategies.boto3 import Boto3Strategy
+from collectfast.strategies.boto3 import MultipartETag
+from collectfast.strategies.boto3 import gzip_bytes
+from collectfast.tests.utils import make_test
+from collectfast.tests.utils import override_setting
+from collectfast.throttling import ThrottledError
+
+
+def create_strategy() -> Boto3Strategy:
+    strategy = Boto3Strategy(S3Boto3Storage())
+    bucket = mock.MagicMock()
+    strategy._create_bucket = lambda: bucket  # type: ignore
+    return strategy
+
+
+@make_test
+@override_setting("preload_remote_hashes", True)
+def test_preloads_remote_hashes(case: TestCase) -> None:
+    strategy = create_strategy()
+    bucket = strategy.bucket
+    bucket.objects.filter.return_value = [mock.Mock(key="a.css", e_tag='"abc"', size=3)]
+
+    case.assertEqual("abc", strategy.get_remote_file_hash("a.css"))
+    case.assertEqual(3, strategy.get_remote_file_size("a.css"))
+    case.assertIsNone(strategy.get_remote_file_hash("b.css"))
+    case.assertIsNone(strategy.get_remote_file_size("b.css"))
+    bucket.objects.filter.assert_called_once_with(Prefix="")
+    bucket.Object.assert_not_called()
+
+
+@make_test
+@override_setting("preload_remote_hashes", True)
+def test_preload_is_scoped_to_location(case: TestCase) -> None:
+    strategy = create_strategy()
+    strategy.remote_storage.location = "static"
+    bucket = strategy.bucket
+    bucket.objects.filter.return_value = [mock.Mock(key="static/a.css", e_tag='"a"')]
+
+    case.assertEqual("a", strategy.get_remote_file_hash("a.css"))
+    bucket.objects.filter.assert_called_once_with(Prefix="static/")
+
+
+@make_test
+def test_remembers_size_from_hash_request(case: TestCase) -> None:
+    strategy = create_strategy()
+    obj = strategy.bucket.Object.return_value
+    obj.e_tag = '"abc"'
+    obj.content_length = 3
+
+    case.assertIsNone(strategy.get_remote_file_size("a.css"))
+    case.assertEqual("abc", strategy.get_remote_file_hash("a.css"))
+    case.assertEqual(3, strategy.get_remote_file_size("a.css"))
+
+
+@make_test
+def test_multipart_etag(case: TestCase) -> None:
+    contents = bytes(range(10))
+    parts = (contents[:4], contents[4:8], contents[8:])
+    expected = hashlib.md5(b"".join(hashlib.md5(p).digest() for p in parts))
+
+    etag = MultipartETag(threshold=4, chunksize=4)
+    for chunk in (contents[:3], contents[3:6], contents[6:9], contents[9:]):
+        etag.update(chunk)
+    case.assertEqual(expected.hexdigest() + "-3", etag.hexdigest())
+
+    etag = MultipartETag(threshold=11, chunksize=4)
+    etag.update(contents)
+    case.assertEqual(hashlib.md5(contents).hexdigest(), etag.hexdigest())
+
+
+@make_test
+@override_setting("aws_multipart_chunksize", 5)
+def test_multipart_chunksize_setting(case: TestCase) -> None:
+    etag = create_strategy().hash_factory()
+    assert isinstance(etag, MultipartETag)
+    case.assertEqual(5, etag.chunksize)
+    case.assertEqual(8 * 1024 * 1024, etag.threshold)
+
+
+@make_test
+def test_deletes_files_in_batches(case: TestCase) -> None:
+    strategy = create_strategy()
+    bucket = strategy.bucket
+    bucket.delete_objects.return_value = {}
+
+    strategy.delete_files([f"{i}.css" for i in range(2500)])
+
+    batches = [
+        call.kwargs["Delete"]["Objects"]
+        for call in bucket.delete_objects.call_args_list
+    ]
+    case.assertEqual([1000, 1000, 500], sorted(map(len, batches), reverse=True))
+
+
+@make_test
+def test_delete_files_with_windows_paths(case: TestCase) -> None:
+    strategy = create_strategy()
+    strategy.bucket.delete_objects.return_value = {}
+    strategy.delete_files(["css\\app.css"])
+    delete = strategy.bucket.delete_objects.call_args.kwargs["Delete"]
+    case.assertEqual([{"Key": "css/app.css"}], delete["Objects"])
+
+
+@make_test
+def test_uploads_windows_paths_to_storage_keys(case: TestCase) -> None:
+    strategy = create_strategy()
+    strategy.remote_storage.location = "static"
+    local_storage = mock.Mock()
+    local_storage.open.return_value = BytesIO(b"foo")
+    strategy.save_file("css\\app.css", "css\\app.css", local_storage)
+    strategy.bucket.Object.assert_called_once_with("static/css/app.css")
+
+
+@make_test
+def test_delete_files_raises_for_errors(case: TestCase) -> None:
+    strategy = create_strategy()
+    strategy.bucket.delete_objects.return_value = {
+        "Errors": [{"Key": "a.css", "Code": "AccessDenied", "Message": "Denied"}]
+    }
+    with case.assertRaises(OSError):
+        strategy.delete_files(["a.css"])
+
+
+@make_test
+def test_reuses_bucket_per_thread(case: TestCase) -> None:
+    strategy = Boto3Strategy(S3Boto3Storage())
+    with mock.patch.object(strategy, "_create_bucket") as create_bucket:
+        case.assertIs(strategy.bucket, strategy.bucket)
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(lambda: strategy.bucket).result()
+    case.assertEqual(2, create_bucket.call_count)
+
+
+@make_test
+@override_setting("threads", 20)
+def test_sizes_connection_pool_to_threads(case: TestCase) -> None:
+    strategy = Boto3Strategy(S3Boto3Storage())
+    case.assertEqual(20, strategy.remote_storage.client_config.max_pool_connections)
+
+
+def precondition_failed() -> botocore.exceptions.ClientError:
+    return botocore.exceptions.ClientError(
+        {"Error": {"Code": "PreconditionFailed", "Message": "At least one failed"}},
+        "PutObject",
+    )
+
+
+@make_test
+@override_setting("aws_conditional_writes", True)
+@override_setting("immutable_file_pattern", r"\.[0-9a-f]{8}\.")
+def test_conditional_write(case: TestCase) -> None:
+    strategy = create_strategy()
+    local_storage = mock.Mock()
+    local_storage.size.return_value = 3
+    local_storage.open.return_value = BytesIO(b"foo")
+    obj = strategy.bucket.Object.return_value
+    path = f"app.{uuid.uuid4().hex[:8]}.js"
+
+    case.assertTrue(strategy.should_copy_file(path, path, local_storage))
+    case.assertTrue(strategy.copy_file(path, path, local_storage))
+    obj.put.assert_called_once_with(Body=b"foo", IfNoneMatch="*", ContentType=mock.ANY)
+    obj.load.assert_not_called()
+
+    strategy.post_copy_hook(path, path, local_storage)
+    case.assertFalse(strategy.should_copy_file(path, path, local_storage))
+    obj.put.assert_called_once()
+    obj.load.assert_not_called()
+
+
+@make_test
+@override_setting("aws_conditional_writes", True)
+@override_setting("immutable_file_pattern", r"\.[0-9a-f]{8}\.")
+def test_conditional_write_caches_existing_object(case: TestCase) -> None:
+    strategy = create_strategy()
+    local_storage = mock.Mock()
+    local_storage.size.return_value = 3
+    local_storage.open.return_value = BytesIO(b"foo")
+    obj = strategy.bucket.Object.return_value
+    obj.put.side_effect = precondition_failed()
+    path = f"app.{uuid.uuid4().hex[:8]}.js"
+
+    case.assertTrue(strategy.should_copy_file(path, path, local_storage))
+    case.assertFalse(strategy.copy_file(path, path, local_storage))
+    case.assertFalse(strategy.should_copy_file(path, path, local_storage))
+    obj.put.assert_called_once()
+    obj.load.assert_not_called()
+
+
+@make_test
+@override_setting("aws_conditional_writes", True)
+def test_conditional_write_checks_other_files_normally(case: TestCase) -> None:
+    strategy = create_strategy()
+    local_storage = mock.Mock()
+    local_storage.path.side_effect = NotImplementedError
+    local_storage.size.return_value = 3
+    local_storage.open.side_effect = lambda path: BytesIO(b"foo")
+    obj = strategy.bucket.Object.return_value
+    obj.e_tag = '"%s"' % hashlib.md5(b"foo").hexdigest()
+    path = f"{uuid.uuid4().hex}.txt"
+
+    case.assertFalse(strategy.should_copy_file(path, path, local_storage))
+    obj.load.assert_called_once()
+    obj.put.assert_not_called()
+
+
+def client_error(code: str, status: int) -> botocore.exceptions.ClientError:
+    return botocore.exceptions.ClientError(
+        {"Error": {"Code": code}, "ResponseMetadata": {"HTTPStatusCode": status}},
+        "HeadObject",
+    )
+
+
+@make_test
+@override_setting("throttle_retries", 2)
+@mock.patch("time.sleep")
+def test_retries_throttled_hash_requests(case: TestCase, sleep: mock.MagicMock) -> None:
+    strategy = create_strategy()
+    obj = strategy.bucket.Object.return_value
+    obj.e_tag = '"abc"'
+    obj.load.side_effect = [client_error("SlowDown", 503), None]
+
+    case.assertEqual("abc", strategy.get_remote_file_hash("a.css"))
+    case.assertEqual(1, sleep.call_count)
+    case.assertEqual({"throttled": 1}, strategy.stats.counts)
+
+    obj.load.side_effect = client_error("503", 503)
+    with case.assertRaises(ThrottledError):
+        strategy.get_remote_file_hash("a.css")
+    case.assertEqual({"throttled": 4}, strategy.stats.counts)
+
+
+@make_test
+def test_missing_object_is_not_retried(case: TestCase) -> None:
+    strategy = create_strategy()
+    obj = strategy.bucket.Object.return_value
+    obj.load.side_effect = client_error("404", 404)
+
+    case.assertIsNone(strategy.get_remote_file_hash("a.css"))
+    obj.load.assert_called_once_with()
+    case.assertEqual({}, strategy.stats.counts)
+
+
+@make_test
+@override_setting("server_side_copy", True)
+def test_server_side_copy(case: TestCase) -> None:
+    strategy = create_strategy()
+    strategy.remote_storage.bucket_name = "bucket"
+    local_storage = mock.Mock()
+    local_storage.path.side_effect = NotImplementedError
+    local_storage.size.return_value = 3
+    local_storage.open.side_effect = lambda path: BytesIO(b"foo")
+    obj = strategy.bucket.Object.return_value
+
+    case.assertTrue(strategy.copy_file("a.js", "a.js", local_storage))
+    case.assertTrue(strategy.copy_file("b.js", "vendor/b.js", local_storage))
+    case.assertTrue(strategy.copy_file("c.css", "c.css", local_storage))
+    case.assertEqual(2, obj.upload_fileobj.call_count)
+    case.assertEqual(
+        ["a.js", "vendor/b.js", "c.css"],
+        [call.args[0] for call in strategy.bucket.Object.call_args_list],
+    )
+    obj.copy_from.assert_called_once_with(
+        CopySource={"Bucket": "bucket", "Key": "a.js"},
+        MetadataDirective="REPLACE",
+        ContentType=mock.ANY,
+    )
+    case.assertEqual(6, strategy.stats.bytes["uploaded"])
+    case.assertEqual({"copied remotely": 1}, strategy.stats.counts)
+
+
+@make_test
+@override_setting("aws_is_gzipped", True)
+def test_uploads_gzipped_contents_kept_from_hashing(case: TestCase) -> None:
+    strategy = create_strategy()
+    strategy.remote_storage.gzip = True
+    obj = strategy.bucket.Object.return_value
+    obj.e_tag = '"abc"'
+    uploaded = []
+    obj.upload_fileobj.side_effect = lambda fileobj, **kwargs: uploaded.append(
+        fileobj.read()
+    )
+    contents = b"lorem ipsum " * 100
+
+    with tempfile.TemporaryDirectory() as directory:
+        local_storage = FileSystemStorage(location=directory)
+        local_storage.save("a.txt", BytesIO(contents))
+        case.assertTrue(strategy.should_copy_file("a.txt", "a.txt", local_storage))
+        with mock.patch.object(local_storage, "open") as open_:
+            case.assertTrue(strategy.copy_file("a.txt", "a.txt", local_storage))
+        open_.assert_not_called()
+
+    case.assertEqual([gzip_bytes(contents)], uploaded)
+    case.assertEqual(len(uploaded[0]), strategy.stats.bytes["uploaded"])
+    case.assertTrue(obj.upload_fileobj.call_args.args[0].closed)
+    case.assertEqual(
+        {"ContentType": "text/plain", "ContentEncoding": "gzip"},
+        obj.upload_fileobj.call_args.kwargs["ExtraArgs"],
+    )
+
+
+@make_test
+def test_hash_identity_depends_on_part_size(case: TestCase) -> None:
+    identity = create_strategy().get_hash_identity()
+    other_part_size = override_setting("aws_multipart_chunksize", 6 * 1024 * 1024)
+    other_identity = other_part_size(create_strategy)().get_hash_identity()
+    case.assertNotEqual(identity, other_identity)
+
+
+@make_test
+def test_uploads_with_bucket_of_thread(case: TestCase) -> None:
+    strategy = create_strategy()
+    local_storage = mock.Mock()
+    local_storage.open.return_value = BytesIO(b"foo")
+    obj = strategy.bucket.Object.return_value
+    uploaded = []
+    obj.upload_fileobj.side_effect = lambda fileobj, **kwargs: uploaded.append(
+        fileobj.read()
+    )
+
+    with mock.patch.object(strategy.remote_storage, "save") as save:
+        strategy.save_file("a.css", "a.css", local_storage)
+    save.assert_not_called()
+    strategy.bucket.Object.assert_called_once_with("a.css")
+    case.assertEqual([b"foo"], uploaded)
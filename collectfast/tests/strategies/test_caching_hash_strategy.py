@@ -6,7 +6,9 @@ from django.core.files.storage import FileSystemStorage
 
 from collectfast import settings
 from collectfast.strategies.base import CachingHashStrategy
+from collectfast.strategies.base import cache
 from collectfast.tests.utils import make_test
+from collectfast.tests.utils import override_setting
 
 hash_characters = string.ascii_letters + string.digits
 
@@ -52,7 +54,7 @@ def test_gets_and_invalidates_hash(case: TestCase) -> None:
 
     # test destroy_etag
     mocked.reset_mock()
-    strategy.invalidate_cached_hash("path")
+    strategy.invalidate_cached_hash("prefixed_path")
     result_hash = strategy.get_cached_remote_file_hash("path", "prefixed_path")
     case.assertEqual(result_hash, expected_hash)
     mocked.assert_called_once_with("prefixed_path")
@@ -72,3 +74,56 @@ def test_post_copy_hook_primes_cache(case: TestCase) -> None:
     case.assertEqual(
         expected_hash, strategy.get_cached_remote_file_hash(filename, filename)
     )
+
+
+@make_test
+@override_setting("cache_batch_size", 10)
+def test_batches_cache_requests(case: TestCase) -> None:
+    strategy = Strategy()
+    storage = strategy.remote_storage
+    files = [(path, path, storage) for path in ("cached", "missing")]
+    cache.set(strategy.get_cache_key("cached"), "hash")
+
+    strategy.on_discover_hook(files)
+    with mock.patch.object(cache, "get", wraps=cache.get) as cache_get:
+        case.assertEqual(
+            "hash", strategy.get_cached_remote_file_hash("cached", "cached")
+        )
+        case.assertEqual(
+            "None", strategy.get_cached_remote_file_hash("missing", "missing")
+        )
+    cache_get.assert_not_called()
+
+    with mock.patch.object(strategy, "get_local_file_hash", return_value="new"):
+        strategy.post_copy_hook("missing", "missing", storage)
+    case.assertIsNone(cache.get(strategy.get_cache_key("missing")))
+
+    with mock.patch.object(cache, "set_many", wraps=cache.set_many) as set_many:
+        strategy.post_collect_hook()
+    set_many.assert_called_once()
+    case.assertEqual("new", cache.get(strategy.get_cache_key("missing")))
+
+
+@make_test
+@override_setting("immutable_file_pattern", r"\.[0-9a-f]{8}\.")
+def test_immutable_file_existence_is_cached(case: TestCase) -> None:
+    strategy = Strategy()
+    path = "app.3f2a9c1b.js"
+    local_storage = mock.Mock()
+    cache.delete(strategy.get_cache_key(path))
+
+    with mock.patch.object(strategy, "get_remote_file_hash", return_value=None):
+        case.assertTrue(strategy.should_copy_file(path, path, local_storage))
+    strategy.post_copy_hook(path, path, local_storage)
+    with mock.patch.object(strategy, "get_remote_file_hash") as get_remote_file_hash:
+        case.assertFalse(strategy.should_copy_file(path, path, local_storage))
+    get_remote_file_hash.assert_not_called()
+
+    cache.delete(strategy.get_cache_key(path))
+    with mock.patch.object(
+        strategy, "get_remote_file_hash", return_value="abc"
+    ) as get_remote_file_hash:
+        case.assertFalse(strategy.should_copy_file(path, path, local_storage))
+        case.assertFalse(strategy.should_copy_file(path, path, local_storage))
+    get_remote_file_hash.assert_called_once_with(path)
+    local_storage.open.assert_not_called()
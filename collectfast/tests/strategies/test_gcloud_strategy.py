@@ -0,0 +1,87 @@
+from unittest import TestCase
+from unittest import mock
+
+from google.api_core.exceptions import Forbidden
+from google.api_core.exceptions import NotFound
+from storages.backends.gcloud import GoogleCloudStorage
+
+from collectfast.strategies.gcloud import GoogleCloudStrategy
+from collectfast.tests.utils import make_test
+from collectfast.tests.utils import override_setting
+
+
+def create_strategy() -> GoogleCloudStrategy:
+    strategy = GoogleCloudStrategy(GoogleCloudStorage())
+    strategy.remote_storage._bucket = mock.MagicMock()
+    strategy.remote_storage._client = mock.MagicMock()
+    return strategy
+
+
+def create_blob(name: str, md5_base64: str) -> mock.Mock:
+    blob = mock.Mock(_properties={"name": name, "md5Hash": md5_base64})
+    # name is a constructor argument of Mock so it must be set separately
+    blob.name = name
+    return blob
+
+
+@make_test
+@override_setting("preload_remote_hashes", True)
+def test_preloads_remote_hashes(case: TestCase) -> None:
+    strategy = create_strategy()
+    bucket = strategy.remote_storage.bucket
+    bucket.list_blobs.return_value = [create_blob("a.css", "q83v")]
+
+    case.assertEqual("abcdef", strategy.get_remote_file_hash("a.css"))
+    case.assertIsNone(strategy.get_remote_file_hash("b.css"))
+    bucket.list_blobs.assert_called_once_with(prefix="", fields=mock.ANY)
+    bucket.get_blob.assert_not_called()
+
+
+@make_test
+@override_setting("preload_remote_hashes", True)
+def test_preload_skipped_for_cached_hashes(case: TestCase) -> None:
+    strategy = create_strategy()
+    bucket = strategy.remote_storage.bucket
+    bucket.list_blobs.return_value = []
+
+    with mock.patch.object(strategy, "get_local_file_hash", return_value="hash"):
+        strategy.post_copy_hook("cached.css", "cached.css", strategy.remote_storage)
+        case.assertFalse(
+            strategy.should_copy_file(
+                "cached.css", "cached.css", strategy.remote_storage
+            )
+        )
+    bucket.list_blobs.assert_not_called()
+
+
+@make_test
+def test_delete_files_in_batches(case: TestCase) -> None:
+    strategy = create_strategy()
+    bucket = strategy.remote_storage.bucket
+    strategy.delete_files([f"{i}.css" for i in range(150)])
+    case.assertEqual(2, strategy.remote_storage.client.batch.call_count)
+    case.assertEqual(150, bucket.delete_blob.call_count)
+
+
+@make_test
+def test_delete_files_ignores_missing_blobs_of_failed_batch(case: TestCase) -> None:
+    strategy = create_strategy()
+    bucket = strategy.remote_storage.bucket
+    batch = strategy.remote_storage.client.batch.return_value
+    batch.__exit__.side_effect = NotFound("missing")
+    bucket.delete_blob.side_effect = [None, None, NotFound("missing"), None]
+    strategy.delete_files(["a.css", "b.css"])
+    case.assertEqual(
+        ["a.css", "b.css"] * 2, [call.args[0] for call in bucket.delete_blob.mock_calls]
+    )
+
+
+@make_test
+def test_delete_files_raises_other_errors_of_failed_batch(case: TestCase) -> None:
+    strategy = create_strategy()
+    bucket = strategy.remote_storage.bucket
+    batch = strategy.remote_storage.client.batch.return_value
+    batch.__exit__.side_effect = NotFound("missing")
+    bucket.delete_blob.side_effect = [None, None, NotFound("missing"), Forbidden("no")]
+    with case.assertRaises(Forbidden):
+        strategy.delete_files(["a.css", "b.css"])
@@ -1,13 +1,22 @@
+import gzip
+import hashlib
+import os
+import pathlib
 import re
 import tempfile
+from io import BytesIO
 from unittest import TestCase
 from unittest import mock
 
 from django.contrib.staticfiles.storage import StaticFilesStorage
 from django.core.files.storage import FileSystemStorage
 
+from collectfast.hash_index import LocalHashIndex
 from collectfast.strategies.base import HashStrategy
+from collectfast.strategies.filesystem import FileSystemStrategy
+from collectfast.tests.utils import create_static_file
 from collectfast.tests.utils import make_test
+from collectfast.tests.utils import override_setting
 
 
 class Strategy(HashStrategy[FileSystemStorage]):
@@ -29,6 +38,52 @@ def test_get_file_hash(case: TestCase) -> None:
     case.assertTrue(re.fullmatch(r"^[A-z0-9]{32}$", hash_) is not None)
 
 
+def gzip_contents(contents: bytes) -> bytes:
+    buffer = BytesIO()
+    with gzip.GzipFile(mode="wb", fileobj=buffer, mtime=0.0) as zf:
+        zf.write(contents)
+    return buffer.getvalue()
+
+
+@make_test
+@override_setting("hash_chunk_size", 7)
+def test_get_file_hash_in_chunks(case: TestCase) -> None:
+    strategy = Strategy()
+    local_storage = StaticFilesStorage()
+    contents = bytes(range(256)) * 10
+
+    with tempfile.NamedTemporaryFile(
+        dir=local_storage.base_location, suffix=".txt"
+    ) as f:
+        f.write(contents)
+        f.flush()
+        case.assertEqual(
+            hashlib.md5(contents).hexdigest(),
+            strategy.get_local_file_hash(f.name, local_storage),
+        )
+        strategy.use_gzip = True
+        case.assertEqual(
+            hashlib.md5(gzip_contents(contents)).hexdigest(),
+            strategy.get_gzipped_local_file_hash("", f.name, local_storage),
+        )
+
+
+@make_test
+def test_reads_file_system_paths_directly(case: TestCase) -> None:
+    strategy = Strategy()
+    local_storage = StaticFilesStorage()
+
+    with tempfile.NamedTemporaryFile(dir=local_storage.base_location) as f:
+        f.write(b"spam")
+        f.flush()
+        with mock.patch.object(local_storage, "open") as open_:
+            case.assertEqual(
+                hashlib.md5(b"spam").hexdigest(),
+                strategy.get_local_file_hash(f.name, local_storage),
+            )
+    open_.assert_not_called()
+
+
 @make_test
 def test_should_copy_file(case: TestCase) -> None:
     strategy = Strategy()
@@ -51,3 +106,137 @@ def test_should_copy_file(case: TestCase) -> None:
             case.assertTrue(
                 strategy.should_copy_file("path", "prefixed_path", local_storage)
             )
+
+
+@make_test
+def test_get_file_hash_from_local_index(case: TestCase) -> None:
+    path = create_static_file()
+    local_storage = FileSystemStorage(location=path.parent)
+    mtime_ns = path.stat().st_mtime_ns - 10**10
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "index.json")
+        strategy = Strategy()
+        strategy.local_hash_index = LocalHashIndex(index_path)
+        expected_hash = strategy.get_local_file_hash(path.name, local_storage)
+        strategy.post_collect_hook()
+
+        strategy = Strategy()
+        strategy.local_hash_index = LocalHashIndex(index_path)
+        with mock.patch.object(strategy, "read_file") as read_file:
+            hash_ = strategy.get_local_file_hash(path.name, local_storage)
+    read_file.assert_not_called()
+    case.assertEqual(expected_hash, hash_)
+
+
+@make_test
+def test_hashes_gzipped_contents_in_single_read(case: TestCase) -> None:
+    strategy = Strategy()
+    strategy.use_gzip = True
+    local_storage = StaticFilesStorage()
+    contents = b"spam" * 100
+
+    with tempfile.NamedTemporaryFile(
+        dir=local_storage.base_location, suffix=".txt"
+    ) as f:
+        f.write(contents)
+        f.flush()
+        with mock.patch.object(
+            strategy, "read_file", wraps=strategy.read_file
+        ) as read_file:
+            hash_ = strategy.get_local_file_hash(f.name, local_storage)
+    read_file.assert_called_once()
+    case.assertEqual(hashlib.md5(gzip_contents(contents)).hexdigest(), hash_)
+
+
+@make_test
+@override_setting("size_prefilter", True)
+def test_should_copy_file_with_different_size_without_hashing(case: TestCase) -> None:
+    strategy = Strategy()
+    path = create_static_file()
+    local_storage = FileSystemStorage(location=path.parent)
+    size = path.stat().st_size
+
+    with mock.patch.object(strategy, "get_local_file_hash") as get_local_file_hash:
+        with mock.patch.object(strategy, "get_remote_file_size", return_value=size):
+            strategy.should_copy_file(path.name, path.name, local_storage)
+        get_local_file_hash.assert_called_once()
+        get_local_file_hash.reset_mock()
+
+        with mock.patch.object(strategy, "get_remote_file_size", return_value=1):
+            case.assertTrue(
+                strategy.should_copy_file(path.name, path.name, local_storage)
+            )
+        get_local_file_hash.assert_not_called()
+
+
+@make_test
+@override_setting("size_prefilter", True)
+def test_file_system_compares_sizes_before_remote_hash(case: TestCase) -> None:
+    path = create_static_file()
+    local_storage = FileSystemStorage(location=path.parent)
+    with tempfile.TemporaryDirectory() as remote_location:
+        strategy = FileSystemStrategy(FileSystemStorage(location=remote_location))
+        pathlib.Path(remote_location, path.name).write_bytes(b"stale")
+
+        with mock.patch.object(strategy, "get_remote_file_hash") as remote_hash:
+            case.assertTrue(
+                strategy.should_copy_file(path.name, path.name, local_storage)
+            )
+    remote_hash.assert_not_called()
+
+
+@make_test
+@override_setting("hash_processes", 2)
+def test_get_file_hash_from_worker_process(case: TestCase) -> None:
+    paths = [create_static_file() for _ in range(3)]
+    local_storage = FileSystemStorage(location=paths[0].parent)
+    strategy = Strategy()
+    strategy.use_gzip = True
+
+    strategy.on_discover_hook([(p.name, p.name, local_storage) for p in paths])
+    with mock.patch.object(strategy, "read_file") as read_file:
+        hashes = [strategy.get_local_file_hash(p.name, local_storage) for p in paths]
+    strategy.post_collect_hook()
+
+    read_file.assert_not_called()
+    for path, hash_ in zip(paths, hashes):
+        expected = hashlib.md5(gzip_contents(path.read_bytes())).hexdigest()
+        case.assertEqual(expected, hash_)
+
+
+@make_test
+@override_setting("hash_processes", 2)
+def test_worker_processes_are_spawned(case: TestCase) -> None:
+    path = create_static_file()
+    local_storage = FileSystemStorage(location=path.parent)
+    strategy = Strategy()
+    with mock.patch(
+        "collectfast.strategies.base.ProcessPoolExecutor"
+    ) as process_pool_executor:
+        strategy.on_discover_hook([(path.name, path.name, local_storage)])
+    mp_context = process_pool_executor.call_args.kwargs["mp_context"]
+    case.assertEqual("spawn", mp_context.get_start_method())
+
+
+@make_test
+@override_setting("immutable_file_pattern", r"\.[0-9a-f]{8}\.")
+def test_should_copy_immutable_file_if_missing(case: TestCase) -> None:
+    strategy = Strategy()
+    local_storage = mock.Mock()
+
+    with mock.patch.object(strategy, "get_remote_file_hash", return_value="abc"):
+        case.assertFalse(
+            strategy.should_copy_file(
+                "app.3f2a9c1b.js", "app.3f2a9c1b.js", local_storage
+            )
+        )
+    with mock.patch.object(strategy, "get_remote_file_hash", return_value=None):
+        case.assertTrue(
+            strategy.should_copy_file(
+                "app.3f2a9c1b.js", "app.3f2a9c1b.js", local_storage
+            )
+        )
+    local_storage.open.assert_not_called()
+    case.assertFalse(strategy.is_immutable("app.js"))
@@ -0,0 +1,40 @@
+from typing import Dict
+from unittest import TestCase
+from unittest import mock
+
+from collectfast.autotune import ThreadTuner
+from collectfast.tests.utils import make_test
+from collectfast.throttling import AdaptiveLimiter
+
+
+def run_windows(tuner: ThreadTuner, rates: Dict[int, float], windows: int) -> None:
+    """Complete windows of files at the files/s given for each tuner value."""
+    now = [0.0]
+    with mock.patch("time.perf_counter", lambda: now[0]):
+        tuner._started = now[0]
+        for _ in range(windows):
+            files = max(tuner.window_files, 2 * tuner.value)
+            now[0] += files / rates[tuner.value]
+            for _ in range(files):
+                tuner.task_done(0)
+
+
+@make_test
+def test_tuner_settles_at_knee(case: TestCase) -> None:
+    limiter = AdaptiveLimiter(64)
+    tuner = ThreadTuner(limiter, 64, 2)
+    case.assertEqual(2, limiter.maximum)
+
+    run_windows(tuner, {2: 10.0, 4: 20.0, 8: 35.0, 16: 36.0}, 4)
+    case.assertTrue(tuner.settled)
+    case.assertEqual(8, tuner.best)
+    case.assertEqual(8, limiter.maximum)
+
+
+@make_test
+def test_tuner_stops_at_maximum(case: TestCase) -> None:
+    limiter = AdaptiveLimiter(8)
+    tuner = ThreadTuner(limiter, 8, 4)
+    run_windows(tuner, {4: 10.0, 8: 20.0}, 2)
+    case.assertTrue(tuner.settled)
+    case.assertEqual(8, limiter.maximum)
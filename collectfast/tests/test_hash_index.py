@@ -0,0 +1,75 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from django.test import override_settings as override_django_settings
+
+from collectfast.hash_index import LocalHashIndex
+from collectfast.hash_index import get_index_path
+from collectfast.tests.utils import create_static_file
+from collectfast.tests.utils import make_test
+from collectfast.tests.utils import override_setting
+
+
+def age_file(path: str) -> None:
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - 10**10))
+
+
+@make_test
+def test_persists_hashes_of_unchanged_files(case: TestCase) -> None:
+    path = str(create_static_file())
+    age_file(path)
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "index.json")
+        index = LocalHashIndex(index_path)
+        index.get(path)["md5"] = "abc"
+        index.save()
+
+        case.assertEqual("abc", LocalHashIndex(index_path).get(path).get("md5"))
+
+        with open(path, "a") as file:
+            file.write("changed")
+        case.assertNotIn("md5", LocalHashIndex(index_path).get(path))
+
+
+@make_test
+def test_only_saves_files_looked_up_during_run(case: TestCase) -> None:
+    first, second = str(create_static_file()), str(create_static_file())
+    age_file(first)
+    age_file(second)
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "index.json")
+        index = LocalHashIndex(index_path)
+        index.get(first)["md5"] = "first"
+        index.get(second)["md5"] = "second"
+        index.save()
+
+        index = LocalHashIndex(index_path)
+        index.get(first)
+        index.save()
+
+        index = LocalHashIndex(index_path)
+        case.assertEqual("first", index.get(first).get("md5"))
+        case.assertNotIn("md5", index.get(second))
+
+
+@make_test
+@override_setting("local_hash_index_path", "")
+@override_django_settings(STATIC_ROOT="/srv/static/")
+def test_index_path_defaults_to_next_to_static_root(case: TestCase) -> None:
+    case.assertEqual("/srv/.collectfast-hashes.json", get_index_path())
+
+
+@make_test
+def test_discards_hashes_computed_differently(case: TestCase) -> None:
+    path = str(create_static_file())
+    age_file(path)
+    with tempfile.TemporaryDirectory() as directory:
+        index_path = os.path.join(directory, "index.json")
+        index = LocalHashIndex(index_path, "md5")
+        index.get(path)["md5"] = "abc"
+        index.save()
+
+        case.assertEqual("abc", LocalHashIndex(index_path, "md5").get(path)["md5"])
+        case.assertNotIn("md5", LocalHashIndex(index_path, "etag:8").get(path))
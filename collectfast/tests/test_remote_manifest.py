@@ -0,0 +1,44 @@
+import json
+import tempfile
+from unittest import TestCase
+
+from django.core.files.storage import FileSystemStorage
+
+from collectfast.remote_manifest import RemoteManifest
+from collectfast.tests.utils import make_test
+
+
+@make_test
+def test_unknown_paths_until_written(case: TestCase) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        storage = FileSystemStorage(location=directory)
+        manifest = RemoteManifest(storage, "manifest.json")
+        with case.assertRaises(KeyError):
+            manifest.lookup("a.css")
+        manifest.set("a.css", "abc")
+        manifest.save()
+
+        manifest = RemoteManifest(storage, "manifest.json")
+        case.assertEqual("abc", manifest.lookup("a.css"))
+        case.assertIsNone(manifest.lookup("b.css"))
+
+
+@make_test
+def test_save_replaces_manifest_only_when_changed(case: TestCase) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        storage = FileSystemStorage(location=directory)
+        manifest = RemoteManifest(storage, "manifest.json")
+        manifest.set("a.css", "abc")
+        manifest.set("b.css", "def")
+        manifest.save()
+
+        manifest = RemoteManifest(storage, "manifest.json")
+        manifest.set("a.css", "abc")
+        manifest.save()
+        case.assertEqual(["manifest.json"], storage.listdir("")[1])
+
+        manifest.set("b.css", None)
+        manifest.save()
+        with storage.open("manifest.json") as f:
+            case.assertEqual({"a.css": "abc"}, json.load(f)["hashes"])
+        case.assertEqual(["manifest.json"], storage.listdir("")[1])
@@ -45,6 +45,13 @@ def test_settings_with_threads():
         assert settings.threads == 22
 
 
+def test_settings_with_auto_threads():
+    with override_settings(COLLECTFAST_THREADS="auto", COLLECTFAST_AUTO_THREADS_MAX=32):
+        reload(settings)
+        assert settings.auto_threads is True
+        assert settings.threads == 32
+
+
 @pytest.mark.parametrize(
     "django_settings",
     (
@@ -0,0 +1,80 @@
+import datetime
+from typing import List
+from typing import Tuple
+from unittest import TestCase
+from unittest import mock
+
+from django.core.management.base import CommandError
+
+from collectfast.sharding import Task
+from collectfast.sharding import named_run_key
+from collectfast.sharding import parse_shard
+from collectfast.sharding import run_key
+from collectfast.sharding import split_tasks
+from collectfast.tests.utils import make_test
+
+
+def create_tasks(sizes: List[int]) -> List[Task]:
+    storage = mock.Mock()
+    storage.size.side_effect = lambda path: sizes[int(path)]
+    return [(str(i), f"file-{i}.txt", storage) for i in range(len(sizes))]
+
+
+def shard_sizes(shards: List[List[Task]], sizes: List[int]) -> List[int]:
+    return [sum(sizes[int(path)] for path, _, _ in shard) for shard in shards]
+
+
+@make_test
+def test_parse_shard(case: TestCase) -> None:
+    case.assertEqual((1, 3), parse_shard("1/3"))
+    invalid: Tuple[str, ...] = ("3/3", "-1/3", "1", "a/b")
+    for value in invalid:
+        with case.assertRaises(CommandError):
+            parse_shard(value)
+
+
+@make_test
+def test_split_tasks_balances_bytes(case: TestCase) -> None:
+    sizes = [100, 60, 50, 40, 30, 20, 10, 10]
+    shards = split_tasks(create_tasks(sizes), 2)
+    case.assertEqual([160, 160], sorted(shard_sizes(shards, sizes)))
+    case.assertEqual(len(sizes), sum(len(shard) for shard in shards))
+
+
+@make_test
+def test_split_tasks_is_independent_of_order(case: TestCase) -> None:
+    sizes = [10] * 20
+    tasks = create_tasks(sizes)
+    shards = split_tasks(tasks, 3)
+    reordered = split_tasks(list(reversed(tasks)), 3)
+    case.assertEqual(
+        [sorted(shard) for shard in shards], [sorted(shard) for shard in reordered]
+    )
+
+
+@make_test
+def test_run_key_depends_on_sizes_and_modified_times(case: TestCase) -> None:
+    sizes = [10, 20]
+    tasks = create_tasks(sizes)
+    storage = tasks[0][2]
+    storage.get_modified_time.return_value = datetime.datetime(2020, 1, 1)
+    key = run_key(tasks, 2)
+    case.assertEqual(key, run_key(tasks[::-1], 2))
+    case.assertNotEqual(key, run_key(tasks, 3))
+    storage.open.assert_not_called()
+
+    storage.get_modified_time.return_value = datetime.datetime(2020, 1, 2)
+    modified_key = run_key(tasks, 2)
+    case.assertNotEqual(key, modified_key)
+    sizes[1] = 30
+    case.assertNotEqual(modified_key, run_key(tasks, 2))
+
+    storage.get_modified_time.side_effect = NotImplementedError
+    case.assertEqual(run_key(tasks, 2), run_key(tasks, 2))
+
+
+@make_test
+def test_named_run_key(case: TestCase) -> None:
+    case.assertEqual(named_run_key("build-1", 2), named_run_key("build-1", 2))
+    case.assertNotEqual(named_run_key("build-1", 2), named_run_key("build-2", 2))
+    case.assertNotEqual(named_run_key("build-1", 2), named_run_key("build-1", 3))
@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+from collectfast.stats import Stats
+from collectfast.stats import format_bytes
+from collectfast.tests.utils import make_test
+
+
+@make_test
+def test_histogram_buckets(case: TestCase) -> None:
+    stats = Stats()
+    for seconds in (0.0005, 0.001, 0.003, 10):
+        stats.add_latency("copy", seconds)
+    histogram = stats.as_dict()["latencies"]["copy"]
+    case.assertEqual(4, histogram["count"])
+    case.assertEqual(10, histogram["max"])
+    case.assertEqual(2, histogram["buckets"]["<=0.001"])
+    case.assertEqual(1, histogram["buckets"]["<=0.005"])
+    case.assertEqual(1, histogram["buckets"][">5"])
+
+
+@make_test
+def test_summary(case: TestCase) -> None:
+    stats = Stats()
+    stats.add_time("collect", 1.5)
+    stats.add_time("find", 0.25)
+    stats.add_bytes("read", 2500)
+    case.assertEqual(
+        "Took 1.50s (find 0.25s); 2.5 kB read, 0 B hashed, 0 B uploaded.",
+        stats.summary(),
+    )
+
+
+@make_test
+def test_format_bytes(case: TestCase) -> None:
+    case.assertEqual("999 B", format_bytes(999))
+    case.assertEqual("1.5 MB", format_bytes(1_500_000))
+    case.assertEqual("2000.0 TB", format_bytes(2 * 10**15))
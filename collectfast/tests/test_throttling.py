@@ -0,0 +1,39 @@
+from unittest import TestCase
+
+from collectfast.tests.utils import make_test
+from collectfast.throttling import AdaptiveLimiter
+from collectfast.throttling import backoff_delay
+
+
+@make_test
+def test_limiter_halves_limit_once_per_epoch(case: TestCase) -> None:
+    limiter = AdaptiveLimiter(16)
+    with limiter.slot() as first, limiter.slot() as second:
+        limiter.on_throttle(first)
+        limiter.on_throttle(second)
+    case.assertEqual(8, limiter.limit)
+    with limiter.slot() as epoch:
+        limiter.on_throttle(epoch)
+    case.assertEqual(4, limiter.limit)
+
+
+@make_test
+def test_limiter_grows_with_fast_requests(case: TestCase) -> None:
+    limiter = AdaptiveLimiter(4)
+    with limiter.slot() as epoch:
+        limiter.on_throttle(epoch)
+    case.assertEqual(2, limiter.limit)
+
+    limiter.on_success("head", 0.01)
+    limiter.on_success("head", 1.0)
+    case.assertEqual(2.5, limiter.limit)
+    for _ in range(20):
+        limiter.on_success("head", 0.01)
+    case.assertEqual(4, limiter.limit)
+
+
+@make_test
+def test_backoff_delay_is_capped(case: TestCase) -> None:
+    for attempt in range(10):
+        delay = backoff_delay(attempt, 0.1, 1.0)
+        case.assertTrue(0 <= delay <= min(1.0, 0.1 * 2**attempt))
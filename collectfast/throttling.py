@@ -0,0 +1,87 @@
+"""
+Adaptive limit of concurrent remote requests, and backoff for requests the
+storage provider throttles.
+"""
+
+import logging
+import random
+import threading
+from contextlib import contextmanager
+from typing import Dict
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class ThrottledError(Exception):
+    """Raised when a remote request is still throttled after all retries."""
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+class AdaptiveLimiter:
+    """
+    Limit of concurrent remote requests, adjusted with additive increase and
+    multiplicative decrease. The limit is halved whenever the provider
+    throttles a request and grows by one for each limit requests completing
+    within latency_tolerance times the fastest latency observed for their
+    operation. Slower requests hold the limit where it is.
+    """
+
+    latency_tolerance = 3.0
+    decrease_factor = 0.5
+
+    def __init__(self, maximum: int) -> None:
+        self.maximum = maximum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self.fastest: Dict[str, float] = {}
+        # Incremented on each decrease, throttling of requests started before
+        # the last decrease doesn't decrease the limit again.
+        self._epoch = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self) -> Iterator[int]:
+        """
+        Wait until fewer requests than the limit are in flight and hold a slot
+        while the block runs. Yield the epoch to pass to on_throttle().
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+            epoch = self._epoch
+        try:
+            yield epoch
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify()
+
+    def set_maximum(self, maximum: int) -> None:
+        """Change the maximum and move the limit to it."""
+        with self._condition:
+            self.maximum = maximum
+            self.limit = float(maximum)
+            self._condition.notify_all()
+
+    def on_success(self, operation: str, seconds: float) -> None:
+        with self._condition:
+            fastest = self.fastest.setdefault(operation, seconds)
+            if seconds < fastest:
+                self.fastest[operation] = seconds
+            if seconds <= fastest * self.latency_tolerance:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self._condition.notify()
+
+    def on_throttle(self, epoch: int) -> None:
+        with self._condition:
+            if epoch != self._epoch:
+                return
+            self.limit = max(1.0, self.limit * self.decrease_factor)
+            self._epoch += 1
+            logger.debug("Decreased concurrency", extra={"limit": int(self.limit)})